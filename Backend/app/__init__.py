@@ -2,7 +2,7 @@ import os
 import cloudinary
 from flask import Flask
 from config import Config
-from .extensions import db, mail, jwt, cors
+from .extensions import db, mail, jwt, cors, response_cache, ph
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -12,6 +12,8 @@ def create_app(config_class=Config):
     db.init_app(app)
     mail.init_app(app)
     jwt.init_app(app)
+    response_cache.init_app(app)
+    ph.init_app(app)
     cors.init_app(app, resources={r"/*": {"origins": app.config.get('FRONTEND_URL')}}, supports_credentials=True)
     
     @jwt.expired_token_loader
@@ -44,9 +46,25 @@ def create_app(config_class=Config):
     app.register_blueprint(favorites_bp)
     app.register_blueprint(owner_bp)
 
-    # Create database tables if they don't exist
+    # Opt-in SQL query accounting per request
+    from .utils.instrumentation_utils import init_query_stats
+    init_query_stats(app)
+
+    # Request metrics at GET /metrics
+    from .utils.metrics_utils import init_metrics
+    init_metrics(app)
+
+    # Register CLI maintenance commands
+    from .commands import register_commands
+    register_commands(app)
+
+    # Create database tables and the keyword search index if they don't exist
+    from .utils.search_utils import ensure_search_index
+    from .utils.geo_utils import register_geo_functions
     with app.app_context():
+        register_geo_functions(db.engine)
         db.create_all()
+        ensure_search_index()
 
     return app
 
@@ -0,0 +1,134 @@
+import time
+import click
+
+from .utils.rating_utils import reconcile_listing_ratings
+from .utils.occupancy_utils import reconcile_occupancy
+from .utils.search_utils import rebuild_search_index
+from .utils.amenity_utils import rebuild_amenity_links
+from .utils.email_utils import deliver_queued_emails
+from .utils.blocklist_utils import prune_token_blocklist
+from .utils.owner_stats_utils import reconcile_owner_stats
+from .utils.benchmark_utils import benchmark_list_serialization, stress_test_bookings, StressTestError
+from .utils.geo_utils import reindex_geo_cells
+from .utils.password_utils import calibrate_argon2
+from .utils.schema_utils import upgrade_schema
+from .extensions import mail
+
+
+def register_commands(app):
+    @app.cli.command("upgrade-schema")
+    def upgrade_schema_command():
+        """Adds columns and indexes introduced on existing tables, which db.create_all() does not."""
+        changes = upgrade_schema()
+        for table, names in changes.items():
+            click.echo(f"{table}: added {', '.join(names)}")
+        click.echo("Schema is up to date." if not changes else f"Upgraded {len(changes)} table(s).")
+
+    @app.cli.command("reconcile-ratings")
+    def reconcile_ratings():
+        """Rebuilds the denormalized rating columns on Listing from the review table."""
+        fixed = reconcile_listing_ratings()
+        click.echo(f"Reconciled ratings, {fixed} listing(s) updated.")
+
+    @app.cli.command("reconcile-occupancy")
+    def reconcile_occupancy_command():
+        """Rebuilds the listing_daily_occupancy table from active bookings."""
+        written = reconcile_occupancy()
+        click.echo(f"Reconciled occupancy, {written} listing-day row(s) written.")
+
+    @app.cli.command("reconcile-owner-stats")
+    def reconcile_owner_stats_command():
+        """Rebuilds the owner_stats dashboard summaries from listings and confirmed bookings."""
+        written = reconcile_owner_stats()
+        click.echo(f"Reconciled owner stats for {written} owner(s).")
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index_command():
+        """Creates the keyword search index if needed and repopulates it from listings."""
+        rebuild_search_index()
+        click.echo("Search index rebuilt.")
+
+    @app.cli.command("reindex-geo-cells")
+    def reindex_geo_cells_command():
+        """Recomputes each listing's geo_cell (geohash) from its latitude and longitude."""
+        changed = reindex_geo_cells()
+        click.echo(f"Reindexed geo cells, {changed} listing(s) updated.")
+
+    @app.cli.command("sync-amenities")
+    def sync_amenities():
+        """Rebuilds the listing_amenity links from each listing's amenities JSON."""
+        count = rebuild_amenity_links()
+        click.echo(f"Synced amenities for {count} listing(s).")
+
+    @app.cli.command("send-queued-emails")
+    @click.option("--loop", is_flag=True, help="Keep polling the queue instead of sending one batch.")
+    @click.option("--interval", default=5.0, show_default=True, help="Seconds to sleep when the queue is empty.")
+    @click.option("--batch-size", default=None, type=int, help="Defaults to EMAIL_BATCH_SIZE.")
+    def send_queued_emails(loop, interval, batch_size):
+        """Delivers queued outbound emails in batches over one SMTP connection per batch."""
+        while True:
+            sent, retried = deliver_queued_emails(mail, batch_size)
+            if sent or retried:
+                click.echo(f"Sent {sent} email(s), {retried} scheduled for retry.")
+            if not loop:
+                break
+            if not (sent or retried):
+                time.sleep(interval)
+
+    @app.cli.command("benchmark-list-serialization")
+    @click.option("--rows", default=2000, show_default=True, help="Synthetic listings to read per run.")
+    @click.option("--repeat", default=5, show_default=True, help="Runs per path, the fastest is reported.")
+    def benchmark_list_serialization_command(rows, repeat):
+        """Compares CPU per row of ORM object loading against the column-tuple list path. Writes nothing."""
+        result = benchmark_list_serialization(rows, repeat)
+        click.echo(f"ORM objects:    {result['orm_us_per_row']:.1f} us/row")
+        click.echo(f"Column tuples:  {result['core_us_per_row']:.1f} us/row")
+        click.echo(f"Speedup:        {result['speedup']:.1f}x over {result['rows']} rows")
+
+    @app.cli.command("calibrate-password-hashing")
+    @click.option("--target-ms", default=250, show_default=True, help="Time one hash should take on this host.")
+    @click.option("--memory-cost", default=None, type=int, help="KiB, defaults to ARGON2_MEMORY_COST.")
+    @click.option("--parallelism", default=None, type=int, help="Defaults to ARGON2_PARALLELISM.")
+    def calibrate_password_hashing(target_ms, memory_cost, parallelism):
+        """Finds the Argon2 time cost that makes one hash take about --target-ms here."""
+        result = calibrate_argon2(
+            target_ms,
+            memory_cost or app.config['ARGON2_MEMORY_COST'],
+            parallelism or app.config['ARGON2_PARALLELISM']
+        )
+        for time_cost, ms in result['timings']:
+            click.echo(f"time_cost={time_cost}: {ms:.1f} ms")
+        click.echo(f"Suggested settings ({result['ms']:.1f} ms per hash):")
+        click.echo(f"ARGON2_TIME_COST={result['time_cost']}")
+        click.echo(f"ARGON2_MEMORY_COST={result['memory_cost']}")
+        click.echo(f"ARGON2_PARALLELISM={result['parallelism']}")
+
+    @app.cli.command("stress-test-bookings")
+    @click.option("--listings", default=5, show_default=True, help="Synthetic listings to book.")
+    @click.option("--seating", default=20, show_default=True, help="Daily seating of each listing.")
+    @click.option("--users", default=100, show_default=True, help="Synthetic users, each books every listing once.")
+    @click.option("--workers", default=16, show_default=True, help="Concurrent request threads.")
+    @click.option("--database-uri", default=None, help="An empty database, defaults to STRESS_TEST_DATABASE_URI, "
+                                                       "then to a temporary SQLite file.")
+    def stress_test_bookings_command(listings, seating, users, workers, database_uri):
+        """Books synthetic listings from concurrent threads, on a separate database, and checks none ends up over capacity."""
+        try:
+            result = stress_test_bookings(
+                app, database_uri or app.config.get('STRESS_TEST_DATABASE_URI'), listings, seating, users, workers
+            )
+        except StressTestError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Requests:        {result['requests']} in {result['seconds']:.2f}s ({result['requests_per_second']:.0f}/s)")
+        click.echo(f"Latency:         p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+        click.echo(f"Status codes:    {', '.join(f'{code}: {count}' for code, count in sorted(result['statuses'].items()))}")
+        click.echo(f"Seats booked:    {result['seats_booked']} of {result['seats_available']}")
+        click.echo(f"Overbooked:      {result['overbooked_listings']} listing(s)")
+        click.echo(f"Counter drift:   {result['occupancy_mismatches']} listing(s)")
+        if result['overbooked_listings'] or result['occupancy_mismatches']:
+            raise SystemExit(1)
+
+    @app.cli.command("prune-token-blocklist")
+    def prune_token_blocklist_command():
+        """Deletes blocklist entries for tokens that have expired or whose user has been deleted."""
+        deleted = prune_token_blocklist()
+        click.echo(f"Pruned {deleted} blocklist entr{'y' if deleted == 1 else 'ies'}.")
@@ -2,11 +2,13 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_mail import Mail
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
-from argon2 import PasswordHasher
+from .utils.cache_utils import ResponseCache
+from .utils.password_utils import PasswordHashing
 
 
 db = SQLAlchemy()
 mail = Mail()
 jwt = JWTManager()
 cors = CORS()
-ph = PasswordHasher()
\ No newline at end of file
+ph = PasswordHashing()
+response_cache = ResponseCache()
\ No newline at end of file
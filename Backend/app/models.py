@@ -1,5 +1,14 @@
+from datetime import datetime, timezone
 from .extensions import db
 from sqlalchemy import JSON, func
+from sqlalchemy.dialects.mysql import DATETIME
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# updated_at columns feed the ETag signals, so they keep microseconds on MySQL too.
+PreciseDateTime = db.DateTime().with_variant(DATETIME(fsp=6), 'mysql')
 
 
 # junction table for the many-to-many relationship.
@@ -8,9 +17,17 @@ favorites_association_table = db.Table('favorites_association',
     db.Column('listing_id', db.Integer, db.ForeignKey('listing.id'), primary_key=True)
 )
 
+# normalized amenity links, so "has all of these amenities" is an indexed lookup.
+listing_amenity_table = db.Table('listing_amenity',
+    db.Column('listing_id', db.Integer, db.ForeignKey('listing.id'), primary_key=True),
+    db.Column('amenity_id', db.Integer, db.ForeignKey('amenity.id'), primary_key=True, index=True)
+)
+
 
 class User(db.Model):
     __tablename__ = 'user'
+    # never reissue a deleted user's id on SQLite, see prune_token_blocklist
+    __table_args__ = {'sqlite_autoincrement': True}
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
@@ -24,10 +41,12 @@ class User(db.Model):
     gender = db.Column(db.String(20), nullable=True)
     age = db.Column(db.Integer, nullable=True)
     profile_image_url = db.Column(db.String(255), nullable=True)
+    updated_at = db.Column(PreciseDateTime, default=utcnow, onupdate=utcnow, index=True)
     
     listings = db.relationship('Listing', backref='owner', lazy=True, cascade="all, delete-orphan")
     bookings = db.relationship('Booking', backref='tenant', lazy=True, cascade="all, delete-orphan")
     reviews = db.relationship('Review', backref='author', lazy=True, cascade="all, delete-orphan")
+    owner_stats = db.relationship('OwnerStats', uselist=False, lazy=True, cascade="all, delete-orphan")
 
     favorites = db.relationship(
         'Listing', 
@@ -59,11 +78,33 @@ class Listing(db.Model):
     ownerName = db.Column(db.String(50), nullable=True)
     is_verified = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(PreciseDateTime, default=utcnow, onupdate=utcnow, index=True)
     image_urls = db.Column(db.JSON, nullable=True)
+
+    # review aggregates, maintained on write by utils/rating_utils.py
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    average_rating = db.Column(db.Float, nullable=True, index=True)
+
+    # location, geo_cell is the geohash of (latitude, longitude) maintained by utils/geo_utils.py
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    geo_cell = db.Column(db.String(12), nullable=True, index=True)
+
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
 
     bookings = db.relationship('Booking', backref='listing', lazy=True, cascade="all, delete-orphan")
     reviews = db.relationship('Review', backref='listing_reviewed', lazy=True, cascade="all, delete-orphan")
+    daily_occupancy = db.relationship('ListingDailyOccupancy', lazy=True, cascade="all, delete-orphan")
+    amenity_tags = db.relationship('Amenity', secondary=listing_amenity_table, lazy=True)
+
+
+class Amenity(db.Model):
+    """Amenity vocabulary, names are stored normalized (stripped, lower case)."""
+    __tablename__ = 'amenity'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
 
 
 class Booking(db.Model):
@@ -76,6 +117,28 @@ class Booking(db.Model):
     attendees = db.Column(db.Integer, nullable=False, default=1)
     status = db.Column(db.String(20), default="Pending")
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(PreciseDateTime, default=utcnow, onupdate=utcnow)
+
+
+class ListingDailyOccupancy(db.Model):
+    """Attendees booked per listing per day, maintained by the booking write paths."""
+    __tablename__ = 'listing_daily_occupancy'
+
+    listing_id = db.Column(db.Integer, db.ForeignKey("listing.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    attendees = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(PreciseDateTime, default=utcnow, onupdate=utcnow)
+
+
+class OwnerStats(db.Model):
+    """Dashboard summary per owner, maintained by the listing and booking write paths."""
+    __tablename__ = 'owner_stats'
+
+    owner_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    total_listings = db.Column(db.Integer, nullable=False, default=0)
+    total_bookings = db.Column(db.Integer, nullable=False, default=0)  # confirmed bookings
+    total_revenue = db.Column(db.Float, nullable=False, default=0.0)  # monthly rent of confirmed bookings
+    updated_at = db.Column(PreciseDateTime, default=utcnow, onupdate=utcnow)
 
 
 class Review(db.Model):
@@ -94,12 +157,34 @@ class Review(db.Model):
     __table_args__ = (db.UniqueConstraint('user_id', 'listing_id', name='_user_listing_uc'),)
 
 
+class OutboundEmail(db.Model):
+    """Durable outbound mail queue, drained in batches by the send-queued-emails worker."""
+    __tablename__ = 'outbound_email'
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(254), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="Pending")  # Pending / Sent / Failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index('ix_outbound_email_due', 'status', 'next_attempt_at'),)
+
+
 class TokenBlocklist(db.Model):
     __tablename__ = 'token_blocklist'
 
     id = db.Column(db.Integer, primary_key=True)
     jti = db.Column(db.String(36), nullable=False, index=True)
-    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), index=True)
+    # token's own expiry, NULL for tokens that never expire
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+    # the token's user, a non-expiring token is pruned once that user is deleted
+    user_id = db.Column(db.Integer, nullable=True, index=True)
 
 
 
@@ -1,19 +1,24 @@
 import os
 import json
 import re
-from datetime import datetime, timezone
 from flask import request, Blueprint
 from flask_restful import Api, Resource
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
 from argon2.exceptions import VerifyMismatchError
 from sqlalchemy import or_
-import cloudinary.uploader
 
 
-from ..extensions import db, mail, ph, jwt
-from ..models import User, TokenBlocklist, Booking
+from ..extensions import db, ph, jwt, response_cache
+from ..models import User, Booking
 from ..routes.bookings import serialize_booking, serialize_booking_for_self
-from ..utils.email_utils import send_verification_email, confirm_email_token, send_password_reset_email, confirm_password_reset_token
+from ..serializers import serialize_listing, LISTING_BASE_FIELDS
+from ..utils.rating_utils import discard_review
+from ..utils.upload_utils import upload_images, UploadError
+from ..utils.blocklist_utils import blocklist_cache, revoke_token
+from ..utils.occupancy_utils import ACTIVE_BOOKING_STATUSES, remove_attendees
+from ..utils.owner_stats_utils import record_booking_status_change
+from ..utils.password_utils import PasswordHashingBusy
+from ..utils.email_utils import queue_verification_email, confirm_email_token, queue_password_reset_email, confirm_password_reset_token
 
 
 # image validation
@@ -24,19 +29,10 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+# password hashing is admission controlled, shed load instead of queueing behind it
+def hashing_busy_response():
+    return {"success": False, "message": "Server is busy, please try again shortly"}, 503, {"Retry-After": "1"}
 
-def serialize_listing_for_profile(listing):
-    if not listing: return None
-    return {
-        "id": listing.id, "title": listing.title, "description": listing.description,
-        "street_address": listing.street_address, "city": listing.city, "state": listing.state, "pincode": listing.pincode,
-        "propertyType": listing.propertyType, "monthlyRent": listing.monthlyRent, "securityDeposit": listing.securityDeposit,
-        "bedrooms": listing.bedrooms, "bathrooms": listing.bathrooms, "seating": listing.seating,
-        "area": listing.area, "furnishing": listing.furnishing, "amenities": listing.amenities or [],
-        "pid": listing.pid, "ownerName": listing.ownerName, "is_verified": listing.is_verified,
-        "created_at": listing.created_at.isoformat() if listing.created_at else None,
-        "image_urls": listing.image_urls or []
-    }
 
 
 # blueprint and API setup
@@ -64,9 +60,7 @@ def serialize_user_profile(user):
 # JWT blocklist checker
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blocklist(jwt_header, jwt_payload):
-    jti = jwt_payload["jti"]
-    token = TokenBlocklist.query.filter_by(jti=jti).one_or_none()
-    return token is not None
+    return blocklist_cache.is_revoked(jwt_payload["jti"])
 
 
 # confirmation of links
@@ -115,9 +109,13 @@ class UserRegistration(Resource):
             hashed_pw = ph.hash(password)
             new_user = User(username=username, email=email, password=hashed_pw, mobile_no=mobile_no, role=role)
             db.session.add(new_user)
+            # queued in the same transaction, the mail worker delivers it
+            queue_verification_email(email)
             db.session.commit()
-            send_verification_email(mail, email)
             return {"success": True, "message": "Check email for verification link"}, 201
+        except PasswordHashingBusy:
+            db.session.rollback()
+            return hashing_busy_response()
         except Exception as e:
             db.session.rollback()
             return {"success": False, "message": f"An error occurred: {e}"}, 500
@@ -141,6 +139,16 @@ class UserLogin(Resource):
             ph.verify(user.password, password)
         except VerifyMismatchError:
             return {"success": False, "message": "Invalid credentials"}, 401
+        except PasswordHashingBusy:
+            return hashing_busy_response()
+
+        # upgrade hashes made with older parameters while the plain password is at hand
+        if ph.check_needs_rehash(user.password):
+            try:
+                user.password = ph.hash(password)
+                db.session.commit()
+            except PasswordHashingBusy:
+                pass  # the next login tries again
 
         if not user.is_verified:
             return {"success": False, "message": "Email not verified. Check your inbox."}, 403
@@ -179,10 +187,11 @@ class ChangePassword(Resource):
         user = User.query.get(user_id)
         try:
             ph.verify(user.password, old_password)
+            user.password = ph.hash(new_password)
         except VerifyMismatchError:
             return {"success": False, "message": "Old password is incorrect"}, 401
-
-        user.password = ph.hash(new_password)
+        except PasswordHashingBusy:
+            return hashing_busy_response()
         db.session.commit()
         return {"success": True, "message": "Password updated successfully"}, 200
 
@@ -196,7 +205,8 @@ class ForgotPassword(Resource):
         
         user = User.query.filter_by(email=email).first()
         if user:
-            send_password_reset_email(mail, email)
+            queue_password_reset_email(email)
+            db.session.commit()
         
         return {"success": True, "message": "If an account with that email exists, a reset link has been sent."}, 200
 
@@ -215,7 +225,10 @@ class ResetPassword(Resource):
         if not user:
             return {"success": False, "message": "User not found"}, 404
 
-        user.password = ph.hash(new_password)
+        try:
+            user.password = ph.hash(new_password)
+        except PasswordHashingBusy:
+            return hashing_busy_response()
         db.session.commit()
         return {"success": True, "message": "Password updated successfully"}, 200
 
@@ -241,7 +254,7 @@ class UserProfileFetch(Resource):
         if user.role.lower() == 'owner':
             # For owners, get their listings...
             owner_listings = user.listings
-            profile_data['my_listings'] = [serialize_listing_for_profile(l) for l in owner_listings]
+            profile_data['my_listings'] = [serialize_listing(l, LISTING_BASE_FIELDS) for l in owner_listings]
 
             # ...and get all bookings for those listings, sorted by creation date.
             owner_listing_ids = [l.id for l in owner_listings]
@@ -277,10 +290,9 @@ class UserProfileUpdate(Resource):
                         return {"success": False, "message": f"File too large: {file.filename}."}, 400
                     file.seek(0)
                     try:
-                        upload_result = cloudinary.uploader.upload(file)
-                        user.profile_image_url = upload_result['secure_url']
-                    except Exception as e:
-                        return {"success": False, "message": f"Image upload failed: {str(e)}"}, 500
+                        user.profile_image_url = upload_images([file])[0]
+                    except UploadError as e:
+                        return {"success": False, "message": str(e)}, 500
             
             if 'data' in request.form:
                 try:
@@ -326,6 +338,8 @@ class UserProfileUpdate(Resource):
             user.address = data.get("address")
 
         db.session.commit()
+        # listing payloads embed owner and review author details
+        response_cache.invalidate_listing()
         return UserProfileFetch().get() 
 
 
@@ -335,11 +349,19 @@ class UserProfileDelete(Resource):
     def delete(self):
         user_id = get_jwt_identity()
         user = User.query.get_or_404(user_id, description="User not found")
-        jti = get_jwt()["jti"]
-        now = datetime.now(timezone.utc)
-        db.session.add(TokenBlocklist(jti=jti, created_at=now))
+        revoke_token(get_jwt())
+        # the user's reviews cascade away with them, take them out of the listing aggregates
+        for review in user.reviews:
+            discard_review(review.listing_id, review.rating)
+        # same for the seats held by their active bookings
+        for booking in user.bookings:
+            if booking.status in ACTIVE_BOOKING_STATUSES:
+                remove_attendees(booking.listing_id, booking.created_at.date(), booking.attendees)
+            # and their confirmed bookings from the owners' summaries
+            record_booking_status_change(booking.listing, booking.status, None)
         db.session.delete(user)
         db.session.commit()
+        response_cache.invalidate_listing()
         return '', 204
 
 
@@ -1,12 +1,16 @@
-from datetime import date
-from flask import request, Blueprint
+from datetime import datetime
+from flask import request, Blueprint, current_app
 from flask_restful import Api, Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func, cast, Date
+from sqlalchemy import func, cast, Date, select, update
 from sqlalchemy.orm import joinedload
 
-from ..extensions import db
+from ..extensions import db, response_cache
 from ..models import Listing, Booking, User
+from ..utils.occupancy_utils import ACTIVE_BOOKING_STATUSES, remove_attendees, reserve_seats
+from ..utils.owner_stats_utils import record_booking_status_change
+from ..utils.export_utils import EXPORT_FORMATS, stream_export
+from ..serializers import serialize_listing, compile_listing_row_serializer, parse_listing_fields, InvalidFieldset, LISTING_BASE_FIELDS
 
 # create Blueprint
 bookings_bp = Blueprint('bookings', __name__)
@@ -17,39 +21,60 @@ def serialize_user_summary(user):
     if not user: return None
     return { "id": user.id, "username": user.username, "email": user.email, "mobile_no": user.mobile_no }
 
-def serialize_listing_summary(listing):
-    if not listing: return None
-    return {
-        "id": listing.id, "title": listing.title, "description": listing.description,
-        "street_address": listing.street_address, "city": listing.city, "state": listing.state, "pincode": listing.pincode,
-        "propertyType": listing.propertyType, "monthlyRent": listing.monthlyRent, "securityDeposit": listing.securityDeposit,
-        "bedrooms": listing.bedrooms, "bathrooms": listing.bathrooms, "seating": listing.seating,
-        "area": listing.area, "furnishing": listing.furnishing, "amenities": listing.amenities or [],
-        "pid": listing.pid, "ownerName": listing.ownerName, "is_verified": listing.is_verified,
-        "created_at": listing.created_at.isoformat() if listing.created_at else None,
-        "image_urls": listing.image_urls or []
-    }
-
-
-def serialize_booking(booking):
+def serialize_booking(booking, listing_fields=LISTING_BASE_FIELDS):
     if not booking: return None
     return {
         "id": booking.id,
         "booking_date": booking.created_at.date().isoformat(),
         "attendees": booking.attendees,
         "status": booking.status,
-        "listing": serialize_listing_summary(booking.listing),
+        "listing": serialize_listing(booking.listing, listing_fields),
         "tenant": serialize_user_summary(booking.tenant)
     }
 
-def serialize_booking_for_self(booking):
+# booking and tenant columns of the list endpoints' Core selects, selected after the listing columns
+BOOKING_ROW_COLUMNS = (
+    Booking.id.label('booking_id'), Booking.created_at.label('booking_created_at'),
+    Booking.attendees.label('booking_attendees'), Booking.status.label('booking_status')
+)
+TENANT_ROW_COLUMNS = (
+    User.id.label('tenant_id'), User.username.label('tenant_username'),
+    User.email.label('tenant_email'), User.mobile_no.label('tenant_mobile_no')
+)
+
+def booking_rows_select(fields, with_tenant=False):
+    """Core select of bookings with their listing's fieldset columns. Returns (select, listing row serializer)."""
+    listing_columns, serialize_listing_row = compile_listing_row_serializer(fields)
+    stmt = select(*listing_columns, *BOOKING_ROW_COLUMNS, *(TENANT_ROW_COLUMNS if with_tenant else ())).select_from(
+        Booking
+    ).join(Listing, Listing.id == Booking.listing_id)
+    if with_tenant:
+        stmt = stmt.outerjoin(User, User.id == Booking.user_id)
+    return stmt, serialize_listing_row
+
+def serialize_booking_row(row, serialize_listing_row, with_tenant=False):
+    data = {
+        "id": row.booking_id,
+        "booking_date": row.booking_created_at.date().isoformat(),
+        "attendees": row.booking_attendees,
+        "status": row.booking_status,
+        "listing": serialize_listing_row(row)
+    }
+    if with_tenant:
+        data["tenant"] = None if row.tenant_id is None else {
+            "id": row.tenant_id, "username": row.tenant_username,
+            "email": row.tenant_email, "mobile_no": row.tenant_mobile_no
+        }
+    return data
+
+def serialize_booking_for_self(booking, listing_fields=LISTING_BASE_FIELDS):
     if not booking: return None
     return {
         "id": booking.id,
         "booking_date": booking.created_at.date().isoformat(), 
         "attendees": booking.attendees,
         "status": booking.status,
-        "listing": serialize_listing_summary(booking.listing)
+        "listing": serialize_listing(booking.listing, listing_fields)
     }
 
 
@@ -61,7 +86,6 @@ class BookingCreate(Resource):
         
         listing_id = data.get("listing_id")
         attendees = data.get("attendees", 1)
-        today = date.today()
 
         if not listing_id:
             return {"success": False, "message": "Missing listing_id"}, 400
@@ -83,10 +107,15 @@ class BookingCreate(Resource):
         if existing_booking_today:
             return {"success": False, "message": "You have already booked this listing"}, 409
 
-        # create the new booking.
-        booking = Booking(user_id=user_id, listing_id=listing_id, attendees=attendees)
+        # reserve the seats first, the booking is only created if they fit within today's capacity
+        now = datetime.now()
+        if not reserve_seats(listing.id, now.date(), attendees, listing.seating):
+            db.session.rollback()
+            return {"success": False, "message": "Not enough seats available for today"}, 409
+        booking = Booking(user_id=user_id, listing_id=listing_id, attendees=attendees, created_at=now)
         db.session.add(booking)
         db.session.commit()
+        response_cache.invalidate_listing(listing.id)
         
         return {"success": True, "data": serialize_booking(booking), "message": "Booking scheduled successfully"}, 201
 
@@ -95,8 +124,15 @@ class MyBookings(Resource):
     @jwt_required()
     def get(self):
         user_id = int(get_jwt_identity())
-        bookings = Booking.query.filter_by(user_id=user_id).order_by(Booking.created_at.desc()).all()
-        result = [serialize_booking_for_self(b) for b in bookings]
+        try:
+            fields = parse_listing_fields(request.args, LISTING_BASE_FIELDS)
+        except InvalidFieldset as e:
+            return {"success": False, "message": str(e)}, 400
+        stmt, serialize_listing_row = booking_rows_select(fields)
+        rows = db.session.execute(
+            stmt.where(Booking.user_id == user_id).order_by(Booking.created_at.desc())
+        ).all()
+        result = [serialize_booking_row(row, serialize_listing_row) for row in rows]
         return {"success": True, "data": result}
 
 
@@ -104,28 +140,180 @@ class OwnerBookings(Resource):
     @jwt_required()
     def get(self):
         user_id = int(get_jwt_identity())
-        owner_listing_ids = db.session.query(Listing.id).filter(Listing.owner_id == user_id)
-        bookings = Booking.query.filter(Booking.listing_id.in_(owner_listing_ids)).order_by(Booking.created_at.desc()).all()
-        result = [serialize_booking(b) for b in bookings]
+        try:
+            fields = parse_listing_fields(request.args, LISTING_BASE_FIELDS)
+        except InvalidFieldset as e:
+            return {"success": False, "message": str(e)}, 400
+        stmt, serialize_listing_row = booking_rows_select(fields, with_tenant=True)
+        rows = db.session.execute(
+            stmt.where(Listing.owner_id == user_id).order_by(Booking.created_at.desc())
+        ).all()
+        result = [serialize_booking_row(row, serialize_listing_row, with_tenant=True) for row in rows]
         return {"success": True, "data": result}
 
 
+# (column name, expression) of the owner bookings export
+OWNER_BOOKING_EXPORT_COLUMNS = [
+    ('id', Booking.id), ('listing_id', Booking.listing_id), ('listing_pid', Listing.pid),
+    ('listing_title', Listing.title), ('monthlyRent', Listing.monthlyRent), ('status', Booking.status),
+    ('attendees', Booking.attendees), ('created_at', Booking.created_at), ('tenant_id', Booking.user_id),
+    ('tenant_username', User.username), ('tenant_email', User.email), ('tenant_mobile_no', User.mobile_no)
+]
+
+class OwnerBookingsExport(Resource):
+    @jwt_required()
+    def get(self):
+        """Streams the bookings on the owner's listings in id order. Pass the last id received as after_id to resume."""
+        user_id = int(get_jwt_identity())
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in EXPORT_FORMATS:
+            return {"success": False, "message": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, 400
+        after_id = request.args.get('after_id', 0, type=int)
+
+        stmt = select(*[expr for _, expr in OWNER_BOOKING_EXPORT_COLUMNS]).join(
+            Listing, Listing.id == Booking.listing_id
+        ).outerjoin(User, User.id == Booking.user_id).where(
+            Listing.owner_id == user_id,
+            Booking.id > after_id
+        ).order_by(Booking.id)
+        return stream_export(stmt, [name for name, _ in OWNER_BOOKING_EXPORT_COLUMNS], export_format, 'bookings')
+
+
+# statuses an owner can set
+BOOKING_STATUSES = ["confirmed", "cancelled", "left"]
+
+
 class BookingUpdate(Resource):
     @jwt_required()
     def patch(self, booking_id):
         user_id = int(get_jwt_identity())
         status = request.get_json().get("status")
         booking = Booking.query.get_or_404(booking_id)
-        if not status or status.lower() not in ["confirmed", "cancelled", "left"]:
+        if not status or status.lower() not in BOOKING_STATUSES:
             return {"success": False, "message": "Invalid status."}, 400
         listing = Listing.query.get(booking.listing_id)
         if listing.owner_id != user_id:
             return {"success": False, "message": "Unauthorized"}, 403
+        was_active = booking.status in ACTIVE_BOOKING_STATUSES
+        is_active = status.capitalize() in ACTIVE_BOOKING_STATUSES
+        # a cancelled or left booking takes its seats again only if they still fit that day
+        if is_active and not was_active and not reserve_seats(
+            booking.listing_id, booking.created_at.date(), booking.attendees, listing.seating
+        ):
+            db.session.rollback()
+            return {"success": False, "message": "Not enough seats available for that day"}, 409
+        old_status = booking.status
         booking.status = status.capitalize()
+        record_booking_status_change(listing, old_status, booking.status)
+        if was_active and not is_active:
+            remove_attendees(booking.listing_id, booking.created_at.date(), booking.attendees)
         db.session.commit()
+        response_cache.invalidate_listing(booking.listing_id)
         return {"success": True, "data": serialize_booking(booking), "message": f"Booking status updated"}, 200
 
 
+def update_booking_statuses(owner_id, booking_ids, status):
+    """
+    Moves the owner's bookings among booking_ids to status with one joined read and one UPDATE,
+    keeping occupancy and owner stats in step. Bookings made active again must still fit the day's
+    seating and are reported as failures when they do not.
+    Returns (per id results in request order, touched listing ids). Nothing is committed here.
+    """
+    rows = db.session.execute(
+        select(Booking.id, Booking.status, Booking.attendees, Booking.created_at, Booking.listing_id,
+               Listing.owner_id, Listing.monthlyRent, Listing.seating)
+        .join(Listing, Listing.id == Booking.listing_id)
+        .where(Booking.id.in_(booking_ids))
+        .with_for_update(of=Booking)
+    ).all()
+    by_id = {row.id: row for row in rows}
+
+    is_active = status in ACTIVE_BOOKING_STATUSES
+    changed = [
+        by_id[booking_id] for booking_id in booking_ids
+        if booking_id in by_id and by_id[booking_id].owner_id == owner_id and by_id[booking_id].status != status
+    ]
+
+    # reactivated bookings take their seats back per (listing, day), all at once when they fit,
+    # otherwise one by one in request order so as many as fit get through
+    full = set()
+    reactivated = {}
+    for row in changed:
+        if is_active and row.status not in ACTIVE_BOOKING_STATUSES:
+            reactivated.setdefault((row.listing_id, row.created_at.date()), []).append(row)
+    for (listing_id, day), group in reactivated.items():
+        if reserve_seats(listing_id, day, sum(row.attendees for row in group), group[0].seating):
+            continue
+        for row in group:
+            if not reserve_seats(listing_id, day, row.attendees, row.seating):
+                full.add(row.id)
+    changed = [row for row in changed if row.id not in full]
+
+    results = []
+    for booking_id in booking_ids:
+        row = by_id.get(booking_id)
+        if row is None:
+            results.append({"id": booking_id, "success": False, "message": "Booking not found"})
+        elif row.owner_id != owner_id:
+            results.append({"id": booking_id, "success": False, "message": "Unauthorized"})
+        elif booking_id in full:
+            results.append({"id": booking_id, "success": False, "message": "Not enough seats available for that day"})
+        else:
+            results.append({"id": booking_id, "success": True, "status": status})
+
+    if changed:
+        db.session.execute(
+            update(Booking).where(Booking.id.in_([row.id for row in changed])).values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+
+    # released seats and owner totals are adjusted once per (listing, day) and (listing, old status)
+    released, status_moves, listings = {}, {}, {}
+    for row in changed:
+        listings[row.listing_id] = row
+        if row.status in ACTIVE_BOOKING_STATUSES and not is_active:
+            key = (row.listing_id, row.created_at.date())
+            released[key] = released.get(key, 0) + row.attendees
+        status_moves[(row.listing_id, row.status)] = status_moves.get((row.listing_id, row.status), 0) + 1
+    for (listing_id, day), attendees in released.items():
+        remove_attendees(listing_id, day, attendees)
+    for (listing_id, old_status), count in status_moves.items():
+        record_booking_status_change(listings[listing_id], old_status, status, count)
+
+    return results, set(listings)
+
+
+class BookingBulkUpdate(Resource):
+    @jwt_required()
+    def patch(self):
+        """Sets one status on many of the owner's bookings, reporting the outcome per booking id."""
+        user_id = int(get_jwt_identity())
+        data = request.get_json() or {}
+        status = data.get("status")
+        booking_ids = data.get("booking_ids")
+        if not status or status.lower() not in BOOKING_STATUSES:
+            return {"success": False, "message": "Invalid status."}, 400
+        if not isinstance(booking_ids, list) or not booking_ids or not all(
+            isinstance(booking_id, int) and not isinstance(booking_id, bool) for booking_id in booking_ids
+        ):
+            return {"success": False, "message": "booking_ids must be a non-empty list of ids"}, 400
+        max_ids = current_app.config['BOOKING_BULK_MAX_IDS']
+        if len(booking_ids) > max_ids:
+            return {"success": False, "message": f"At most {max_ids} bookings can be updated at once"}, 413
+
+        results, listing_ids = update_booking_statuses(user_id, list(dict.fromkeys(booking_ids)), status.capitalize())
+        db.session.commit()
+        for listing_id in listing_ids:
+            response_cache.invalidate_listing(listing_id)
+
+        updated = sum(1 for result in results if result["success"])
+        return {
+            "success": True,
+            "data": {"updated": updated, "failed": len(results) - updated, "results": results},
+            "message": f"{updated} of {len(results)} bookings updated"
+        }, 200
+
+
 class BookingCancel(Resource):
     @jwt_required()
     def delete(self, booking_id):
@@ -133,14 +321,21 @@ class BookingCancel(Resource):
         booking = Booking.query.get_or_404(booking_id)
         if booking.user_id != user_id:
             return {"success": False, "message": "Unauthorized"}, 403
+        if booking.status in ACTIVE_BOOKING_STATUSES:
+            remove_attendees(booking.listing_id, booking.created_at.date(), booking.attendees)
+        record_booking_status_change(booking.listing, booking.status, None)
+        listing_id = booking.listing_id
         db.session.delete(booking)
         db.session.commit()
+        response_cache.invalidate_listing(listing_id)
         return {"success": True, "message": "Booking cancelled successfully"}, 200
 
 
 api.add_resource(BookingCreate, "/bookings/create")
 api.add_resource(MyBookings, "/bookings/my")
 api.add_resource(OwnerBookings, "/bookings/owner")
+api.add_resource(OwnerBookingsExport, "/bookings/owner/export")
+api.add_resource(BookingBulkUpdate, "/bookings/status")
 api.add_resource(BookingUpdate, "/bookings/<int:booking_id>")
 api.add_resource(BookingCancel, "/bookings/<int:booking_id>/cancel")
 
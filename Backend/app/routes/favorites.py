@@ -1,47 +1,29 @@
 from flask import request, Blueprint
 from flask_restful import Api, Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func
 
 from ..extensions import db
-from ..models import User, Listing
+from ..models import User, Listing, favorites_association_table
+from ..utils.favorite_utils import add_favorite, remove_favorite
+from ..utils.http_cache_utils import make_etag, is_not_modified, conditional_headers
+from ..serializers import serialize_listing, listing_select, parse_listing_fields, InvalidFieldset, LISTING_DETAIL_FIELDS
 
 favorites_bp = Blueprint('favorites', __name__)
 api = Api(favorites_bp)
 
 
-def serialize_owner_summary(owner):
-    if not owner: return None
-    return {
-        "id": owner.id,
-        "username": owner.username,
-        "mobile_no": owner.mobile_no
-    }
-
-
-def serialize_listing_for_favorites(listing):
-    if not listing: return None
-    return {
-        "id": listing.id,
-        "title": listing.title,
-        "description": listing.description,
-        "street_address": listing.street_address,
-        "city": listing.city,
-        "state": listing.state,
-        "pincode": listing.pincode,
-        "monthlyRent": listing.monthlyRent,
-        "securityDeposit": listing.securityDeposit,
-        "propertyType": listing.propertyType,
-        "bedrooms": listing.bedrooms,
-        "bathrooms": listing.bathrooms,
-        "seating": listing.seating,
-        "area": listing.area,
-        "furnishing": listing.furnishing,
-        "amenities": listing.amenities or [],
-        "pid": listing.pid, "ownerName": listing.ownerName, "is_verified": listing.is_verified,
-        "created_at": listing.created_at.isoformat() if listing.created_at else None,
-        "image_urls": listing.image_urls or [], # Return all images
-        "owner": serialize_owner_summary(listing.owner) # Include nested owner details
-    }
+def get_favorites_signal(user_id):
+    """
+    Version signal for a user's favorites: which listings they are, the listings' versions and owner
+    profile updates. Removing a favorite leaves no timestamp behind, so there is no Last-Modified,
+    membership changes are only seen through the ETag.
+    """
+    versions = db.session.query(Listing.id, Listing.updated_at).join(
+        favorites_association_table, favorites_association_table.c.listing_id == Listing.id
+    ).filter(favorites_association_table.c.user_id == user_id).order_by(Listing.id).all()
+    users_updated = db.session.query(func.max(User.updated_at)).scalar()
+    return (tuple(versions), users_updated)
 
 
 class FavoriteList(Resource):
@@ -49,42 +31,50 @@ class FavoriteList(Resource):
     def get(self):
         """Fetches all of the current user's favorite listings with full details."""
         user_id = int(get_jwt_identity())
-        user = User.query.get_or_404(user_id)
+        try:
+            fields = parse_listing_fields(request.args, LISTING_DETAIL_FIELDS)
+        except InvalidFieldset as e:
+            return {"success": False, "message": str(e)}, 400
+
+        etag = make_etag('favorites', user_id, get_favorites_signal(user_id), fields)
+        headers = conditional_headers(etag)
+        if is_not_modified(etag):
+            return '', 304, headers
+
+        User.query.get_or_404(user_id)
             
-        favorite_listings = user.favorites
+        stmt, serialize = listing_select(fields)
+        rows = db.session.execute(stmt.join(
+            favorites_association_table, favorites_association_table.c.listing_id == Listing.id
+        ).where(favorites_association_table.c.user_id == user_id)).all()
         
-        return {"success": True, "data": [serialize_listing_for_favorites(l) for l in favorite_listings]}
+        return {"success": True, "data": [serialize(row) for row in rows]}, 200, headers
 
 
 class FavoriteResource(Resource):
     @jwt_required()
     def post(self, listing_id):
         user_id = int(get_jwt_identity())
-        user = User.query.get_or_404(user_id)
+        User.query.get_or_404(user_id)
         listing = Listing.query.get_or_404(listing_id)
 
-        if listing in user.favorites:
+        if not add_favorite(user_id, listing_id):
             return {"success": False, "message": "Listing already in favorites"}, 409
-
-        user.favorites.append(listing)
         db.session.commit()
 
         return {
             "success": True, 
-            "data": serialize_listing_for_favorites(listing),
+            "data": serialize_listing(listing),
             "message": "Listing added to favorites"
         }, 201
 
     @jwt_required()
     def delete(self, listing_id):
         user_id = int(get_jwt_identity())
-        user = User.query.get_or_404(user_id)
-        listing = Listing.query.get_or_404(listing_id)
+        User.query.get_or_404(user_id)
 
-        if listing not in user.favorites:
+        if not remove_favorite(user_id, listing_id):
             return {"success": False, "message": "Listing not in favorites"}, 404
-
-        user.favorites.remove(listing)
         db.session.commit()
         
         return '', 204
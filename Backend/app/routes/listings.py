@@ -1,53 +1,40 @@
 import os
+import csv
 import json
 from datetime import date
-from flask import request, Blueprint
+from flask import request, Blueprint, current_app
 from flask_restful import Api, Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import or_, cast, String, func, Date
+from sqlalchemy import or_, cast, String, func, Date, select
 from sqlalchemy.orm.attributes import flag_modified
-import cloudinary.uploader
 
-from ..extensions import db
-from ..models import User, Listing, Booking, Review
+from ..extensions import db, response_cache
+from ..models import User, Listing, Booking, Review, ListingDailyOccupancy
+from ..utils.upload_utils import upload_images, UploadError
+from ..utils.http_cache_utils import make_etag, latest, is_not_modified, conditional_headers
+from ..utils.pagination_utils import paginate_listings, get_page_size, InvalidCursor
+from ..utils.rating_utils import record_review
+from ..utils.search_utils import apply_keyword_search
+from ..utils.amenity_utils import sync_listing_amenities, filter_by_amenities, normalize_amenities
+from ..utils.facet_utils import facet_select, compute_facets
+from ..utils.occupancy_utils import ACTIVE_BOOKING_STATUSES, get_attendees, get_attendees_by_listing
+from ..utils.owner_stats_utils import record_listing_created, record_listing_deleted, record_rent_changed
+from ..utils.favorite_utils import get_favorite_listing_ids
+from ..utils.export_utils import EXPORT_FORMATS, stream_export
+from ..utils.import_utils import IMPORT_FORMATS, InvalidImport, read_import_rows, import_listings
+from ..utils.geo_utils import (
+    InvalidLocation, parse_coordinates, parse_near, parse_bbox, filter_near, filter_by_bbox, haversine_km,
+    set_listing_location
+)
+from ..serializers import (
+    serialize_listing, compile_listing_row_serializer, listing_select, parse_listing_fields, InvalidFieldset,
+    LISTING_DETAIL_FIELDS, LISTING_LIST_FIELDS
+)
 
 listings_bp = Blueprint('listings', __name__)
 api = Api(listings_bp)
 
 
-def serialize_owner(owner):
-    if not owner: return None
-    return {
-        "id": owner.id, "username": owner.username, "mobile_no": owner.mobile_no,
-        "gender": owner.gender, "age": owner.age
-    }
-
-def serialize_listing_full_detail(listing):
-    """Creates a complete dictionary of a listing's details."""
-    if not listing: return None
-    return {
-        "id": listing.id, "title": listing.title, "description": listing.description,
-        "street_address": listing.street_address, "city": listing.city, "state": listing.state, "pincode": listing.pincode,
-        "propertyType": listing.propertyType, "monthlyRent": listing.monthlyRent, "securityDeposit": listing.securityDeposit,
-        "bedrooms": listing.bedrooms, "bathrooms": listing.bathrooms, "seating": listing.seating,
-        "area": listing.area, "furnishing": listing.furnishing, "amenities": listing.amenities or [],
-        "pid": listing.pid, "ownerName": listing.ownerName, "is_verified": listing.is_verified,
-        "created_at": listing.created_at.isoformat() if listing.created_at else None,
-        "image_urls": listing.image_urls or [], "owner": serialize_owner(listing.owner)
-    }
-
-def serialize_listing_for_list_view(listing, status, avg_rating, review_count):
-    """Creates a dictionary for the main list, including calculated stats."""
-    full_details = serialize_listing_full_detail(listing)
-    if not full_details: return None
-    
-    full_details.update({
-        "availability_status": status,
-        "average_rating": round(float(avg_rating), 2) if avg_rating else None,
-        "review_count": review_count or 0
-    })
-    return full_details
-
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 MAX_CONTENT_LENGTH = 5 * 1024 * 1024 # 5 MB
 
@@ -68,6 +55,10 @@ class ListingCreate(Resource):
         data = json.loads(request.form['data'])
         required_fields = ['title', 'street_address', 'city', 'state', 'pincode', 'propertyType', 'monthlyRent', 'securityDeposit', 'bedrooms', 'bathrooms', 'seating', 'area', 'furnishing', 'amenities']
         if not all(field in data for field in required_fields): return {"success": False, "message": "Missing required fields"}, 400
+        try:
+            data['latitude'], data['longitude'] = parse_coordinates(data.get('latitude'), data.get('longitude'))
+        except InvalidLocation as e:
+            return {"success": False, "message": str(e)}, 400
         if 'images' not in request.files or not request.files.getlist('images') or request.files.getlist('images')[0].filename == '':
             return {"success": False, "message": "At least one image is required."}, 400
         
@@ -79,95 +70,240 @@ class ListingCreate(Resource):
             if Listing.query.filter_by(pid=pid).first():
                 return {"success": False, "message": "Property ID is already in use."}, 409
         
-        uploaded_urls = []
-        for file in request.files.getlist('images'):
+        files = request.files.getlist('images')
+        for file in files:
             if not allowed_file(file.filename): return {"success": False, "message": f"Invalid file type: {file.filename}."}, 400
             file.seek(0, os.SEEK_END)
             if file.tell() > MAX_CONTENT_LENGTH: return {"success": False, "message": f"File too large: {file.filename}."}, 400
             file.seek(0)
-            upload_result = cloudinary.uploader.upload(file)
-            uploaded_urls.append(upload_result['secure_url'])
+
+        try:
+            uploaded_urls = upload_images(files)
+        except UploadError as e:
+            return {"success": False, "message": str(e)}, 500
         
+        # rating aggregates are maintained by the server, never taken from the client
+        for field in ('rating_sum', 'review_count', 'average_rating', 'geo_cell'):
+            data.pop(field, None)
+
         listing = Listing(owner_id=user_id, image_urls=uploaded_urls, **data)
+        set_listing_location(listing)
         db.session.add(listing)
+        sync_listing_amenities(listing)
+        record_listing_created(listing)
         db.session.commit()
+        response_cache.invalidate_listing(listing.id)
         
-        return {"success": True, "data": serialize_listing_full_detail(listing), "message": "Listing created successfully"}, 201
+        return {"success": True, "data": serialize_listing(listing), "message": "Listing created successfully"}, 201
+
+
+class ListingImport(Resource):
+    @jwt_required()
+    def post(self):
+        """
+        Creates many listings from a CSV or NDJSON file (multipart field "file") or request body.
+        Rows are validated like /listings/create, with images given as hosted URLs in image_urls.
+        Valid rows are created even when others fail; the response reports both.
+        """
+        user_id = int(get_jwt_identity())
+        user = User.query.get_or_404(user_id)
+        if user.role.lower() != "owner":
+            return {"success": False, "message": "Unauthorized"}, 403
+
+        upload = request.files.get('file')
+        filename = upload.filename if upload else ''
+        default_format = 'csv' if filename.lower().endswith('.csv') or request.mimetype == 'text/csv' else 'ndjson'
+        import_format = request.args.get('format', default_format).lower()
+        if import_format not in IMPORT_FORMATS:
+            return {"success": False, "message": f"format must be one of: {', '.join(sorted(IMPORT_FORMATS))}"}, 400
+
+        try:
+            text = (upload.read() if upload else request.get_data()).decode('utf-8-sig')
+            rows = read_import_rows(text, import_format)
+        except UnicodeDecodeError:
+            return {"success": False, "message": "File must be UTF-8 encoded"}, 400
+        except (InvalidImport, csv.Error) as e:
+            return {"success": False, "message": str(e)}, 400
+        if not rows:
+            return {"success": False, "message": "No rows to import"}, 400
+        max_rows = current_app.config['IMPORT_MAX_ROWS']
+        if len(rows) > max_rows:
+            return {"success": False, "message": f"At most {max_rows} rows can be imported at once"}, 413
+
+        created, errors = import_listings(user_id, rows)
+        if not created:
+            db.session.rollback()
+            return {"success": False, "data": {"created": [], "errors": errors}, "message": "No listings were imported"}, 400
+        db.session.commit()
+        response_cache.invalidate_listing()
+
+        return {
+            "success": True,
+            "data": {"created": created, "errors": errors},
+            "message": f"Imported {len(created)} of {len(rows)} listings"
+        }, 201
+
+
+def get_user_booked_listing_ids(user_id, listing_ids=None):
+    """Returns the listing ids (within listing_ids, if given) the user holds an active booking for."""
+    if not user_id or listing_ids == []: return set()
+    query = db.session.query(Booking.listing_id).filter(
+        Booking.user_id == user_id,
+        Booking.status.in_(ACTIVE_BOOKING_STATUSES)
+    )
+    if listing_ids is not None:
+        query = query.filter(Booking.listing_id.in_(listing_ids))
+    return {listing_id for (listing_id,) in query.distinct().all()}
+
+def apply_user_bookings(serialized_listings, booked_by_user, fields=LISTING_LIST_FIELDS):
+    """Marks listings the user has booked as "Booked", copying entries so shared cached payloads stay untouched."""
+    if not booked_by_user or 'availability_status' not in fields: return serialized_listings
+    return [
+        dict(l, availability_status="Booked") if l["id"] in booked_by_user else l
+        for l in serialized_listings
+    ]
+
+def apply_user_favorites(serialized_listings, user_id, favorite_ids=None):
+    """Adds the user's is_favorite flag from one lookup for the whole page, copying entries like apply_user_bookings."""
+    if favorite_ids is None:
+        favorite_ids = get_favorite_listing_ids(user_id, list({l["id"] for l in serialized_listings}))
+    return [dict(l, is_favorite=l["id"] in favorite_ids) for l in serialized_listings]
+
+def get_catalog_signal(today):
+    """
+    Cheap change signal for public listing reads, fetched in one round trip: listing inserts, deletes
+    and updates (ratings included), owner/author profile updates and today's occupancy.
+    Returns (etag parts, last modified).
+    """
+    todays_occupancy = ListingDailyOccupancy.day == today
+    row = db.session.query(
+        select(func.count(Listing.id)).scalar_subquery(),
+        select(func.max(Listing.id)).scalar_subquery(),
+        select(func.max(Listing.updated_at)).scalar_subquery(),
+        select(func.max(User.updated_at)).scalar_subquery(),
+        select(func.sum(ListingDailyOccupancy.attendees)).where(todays_occupancy).scalar_subquery(),
+        select(func.max(ListingDailyOccupancy.updated_at)).where(todays_occupancy).scalar_subquery()
+    ).one()
+    listing_count, max_listing_id, listings_updated, users_updated, attendees_today, occupancy_updated = row
+    return (today, *row), latest(listings_updated, users_updated, occupancy_updated)
+
+FEATURED_MIN_RATING = 4.0
+FEATURED_LIMIT = 5
+
+# list endpoints always select the rent column, cursors for the rent sorts are built from it
+LIST_VIEW_EXTRA_COLUMNS = (Listing.monthlyRent,)
+
+def get_featured_listings(fields=LISTING_LIST_FIELDS):
+    """Top rated listings as column rows, read off the indexed average_rating column."""
+    stmt, _ = listing_select(fields, *LIST_VIEW_EXTRA_COLUMNS)
+    return db.session.execute(
+        stmt.where(Listing.average_rating >= FEATURED_MIN_RATING).order_by(
+            Listing.average_rating.desc(), Listing.id
+        ).limit(FEATURED_LIMIT)
+    ).all()
+
+def serialize_listings_for_list_view(rows, fields=LISTING_LIST_FIELDS):
+    """
+    Serializes listing rows from listing_select, with today's availability fetched in batch
+    for the whole set when it is requested.
+    """
+    _, serialize = compile_listing_row_serializer(fields, LIST_VIEW_EXTRA_COLUMNS)
+    if 'availability_status' not in fields:
+        return [serialize(row) for row in rows]
+
+    attendees_today = get_attendees_by_listing(list({row.id for row in rows}), date.today())
+    result = []
+    for row in rows:
+        total_attendees_today = attendees_today.get(row.id, 0)
+        status = "Booked" if row.seating is not None and total_attendees_today >= row.seating else "Available"
+        result.append(serialize(row, availability_status=status))
+    return result
 
 
 class ListingList(Resource):
     @jwt_required(optional=True)  # authentication optional
     def get(self):
-        today = date.today()
-        listings = Listing.query.all()
-        result = []
-        featured_listings = []
-
         current_user_id = get_jwt_identity()
+        sort_by = request.args.get('sort_by')
+        cursor = request.args.get('cursor')
+        limit = get_page_size(request.args.get('limit', type=int))
+        today = date.today()
+        try:
+            fields = parse_listing_fields(request.args, LISTING_LIST_FIELDS)
+        except InvalidFieldset as e:
+            return {"success": False, "message": str(e)}, 400
+
+        # revalidate against the version signal before any serialization work
+        signal, last_modified = get_catalog_signal(today)
+        booked_by_user = get_user_booked_listing_ids(current_user_id) if 'availability_status' in fields else set()
+        # the caller's own favorites, so one user's change does not move everyone's ETag
+        favorite_ids = get_favorite_listing_ids(current_user_id)
+        etag = make_etag(
+            'listings', signal, current_user_id, sort_by, cursor, limit, fields, sorted(booked_by_user), sorted(favorite_ids)
+        )
+        headers = conditional_headers(etag, last_modified)
+        if is_not_modified(etag, last_modified):
+            return '', 304, headers
+
+        # the page is shared by every caller, the personal "Booked" status is layered on after.
+        # keyed by the signal too, so a change made through another worker is never served under the new ETag
+        cache_key = ('listings', sort_by, cursor, limit, fields, signal)
+        page = response_cache.get(cache_key)
+        if page is None:
+            try:
+                stmt, _ = listing_select(fields, *LIST_VIEW_EXTRA_COLUMNS)
+                listings, next_cursor, has_more = paginate_listings(stmt, sort_by, cursor, limit)
+            except InvalidCursor as e:
+                return {"success": False, "message": str(e)}, 400
+
+            # featured block is computed on its own and only sent with the first page
+            featured_listings = [] if cursor else get_featured_listings(fields)
+
+            serialized = serialize_listings_for_list_view(featured_listings + listings, fields)
+            page = {
+                "featured": serialized[:len(featured_listings)],
+                "all_listings": serialized[len(featured_listings):],
+                "next_cursor": next_cursor,
+                "has_more": has_more
+            }
+            response_cache.set(cache_key, page)
 
-        for l in listings:
-            status = "Available" # default status
-
-            # check for a personal booking if a user is logged in
-            if current_user_id:
-                user_has_booking = Booking.query.filter(
-                    Booking.user_id == current_user_id,
-                    Booking.listing_id == l.id,
-                    Booking.status.in_(['Confirmed', 'Pending'])
-                ).first()
-                if user_has_booking:
-                    status = "Booked"
-
-            # if not personally booked, check for general availability
-            if status == "Available":
-                total_attendees_today = db.session.query(func.sum(Booking.attendees)).filter(
-                    Booking.listing_id == l.id,
-                    cast(Booking.created_at, Date) == today, 
-                    Booking.status.in_(['Confirmed', 'Pending'])
-                ).scalar() or 0
-
-                if l.seating is not None and total_attendees_today >= l.seating:
-                    status = "Booked"
-
-            review_stats = db.session.query(
-                func.avg(Review.rating), func.count(Review.id)
-            ).filter(Review.listing_id == l.id).first()
-            avg_rating, review_count = review_stats or (None, 0)
-            
-            listing_data = serialize_listing_for_list_view(l, status, avg_rating, review_count)
-            result.append(listing_data)
-            
-            if avg_rating and avg_rating >= 4.0:
-                featured_listings.append(listing_data)
-
-        featured_listings.sort(key=lambda x: x.get('average_rating') or 0, reverse=True)
+        featured, all_listings = page["featured"], page["all_listings"]
+        if current_user_id:
+            personal = apply_user_bookings(featured + all_listings, booked_by_user, fields)
+            personal = apply_user_favorites(personal, int(current_user_id), favorite_ids)
+            featured, all_listings = personal[:len(featured)], personal[len(featured):]
         
         return {
             "success": True, 
             "data": {
-                "featured": featured_listings[:5],
-                "all_listings": result
-            }
-        }
+                "featured": featured,
+                "all_listings": all_listings
+            },
+            "next_cursor": page["next_cursor"],
+            "has_more": page["has_more"]
+        }, 200, headers
 
 class ListingResource(Resource):
     def get(self, listing_id):
-        listing = Listing.query.get_or_404(listing_id)
         today = date.today()
+        signal, last_modified = get_catalog_signal(today)
+        etag = make_etag('listing', signal, listing_id)
+        headers = conditional_headers(etag, last_modified)
+        if is_not_modified(etag, last_modified):
+            return '', 304, headers
+
+        cache_key = ('listing', listing_id, signal)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached, 200, headers
 
-        total_attendees_today = db.session.query(func.sum(Booking.attendees)).filter(
-            Booking.listing_id == listing.id,
-            cast(Booking.created_at, Date) == today, 
-            Booking.status.in_(['Confirmed', 'Pending'])
-        ).scalar() or 0
+        listing = Listing.query.get_or_404(listing_id)
+
+        total_attendees_today = get_attendees(listing.id, today)
         status = "Booked" if listing.seating is not None and total_attendees_today >= listing.seating else "Available"
 
-        review_stats = db.session.query(
-            func.avg(Review.rating), func.count(Review.id)
-        ).filter(Review.listing_id == listing.id).first()
-        avg_rating, review_count = review_stats or (None, 0)
-        
-        listing_data = serialize_listing_for_list_view(listing, status, avg_rating, review_count)
+        listing_data = serialize_listing(listing, LISTING_LIST_FIELDS, availability_status=status)
 
         reviews_data = []
         for review in listing.reviews:
@@ -178,7 +314,9 @@ class ListingResource(Resource):
             })
         listing_data["reviews"] = reviews_data
         
-        return {"success": True, "data": listing_data}
+        response = {"success": True, "data": listing_data}
+        response_cache.set(cache_key, response)
+        return response, 200, headers
     
     @jwt_required()
     def patch(self, listing_id):
@@ -189,6 +327,7 @@ class ListingResource(Resource):
 
         data = {}
         is_gallery_replacement = False
+        old_rent = listing.monthlyRent
 
         if 'data' in request.form or 'images' in request.files: 
             if 'data' in request.form:
@@ -204,14 +343,12 @@ class ListingResource(Resource):
             if 'images' in request.files:
                 files = request.files.getlist('images')
                 if files and files[0].filename != '':
-                    uploaded_urls = []
                     for file in files:
                         if not allowed_file(file.filename): return {"success": False, "message": f"Invalid file type: {file.filename}."}, 400
-                        try:
-                            upload_result = cloudinary.uploader.upload(file)
-                            uploaded_urls.append(upload_result['secure_url'])
-                        except Exception as e:
-                            return {"success": False, "message": f"Image upload failed: {str(e)}"}, 500
+                    try:
+                        uploaded_urls = upload_images(files)
+                    except UploadError as e:
+                        return {"success": False, "message": str(e)}, 500
                     
                     if not is_gallery_replacement:
                         if listing.image_urls is None: listing.image_urls = []
@@ -225,17 +362,28 @@ class ListingResource(Resource):
         
         for field in ['title', 'description', 'street_address', 'city', 'state', 'pincode', 'propertyType', 
                 'monthlyRent', 'securityDeposit', 'bedrooms', 'bathrooms', 'seating', 'area', 
-                'furnishing', 'amenities']:
+                'furnishing', 'amenities', 'latitude', 'longitude']:
             if field in data:
                 if field != 'image_urls':
                     setattr(listing, field, data[field])
 
+        if 'latitude' in data or 'longitude' in data:
+            try:
+                set_listing_location(listing)
+            except InvalidLocation as e:
+                db.session.rollback()
+                return {"success": False, "message": str(e)}, 400
+
         if 'amenities' in data:
             flag_modified(listing, "amenities")
+            sync_listing_amenities(listing)
+        if 'monthlyRent' in data:
+            record_rent_changed(listing, old_rent)
         if is_gallery_replacement or ('images' in request.files and request.files.getlist('images')[0].filename != ''):
             flag_modified(listing, "image_urls")
 
         db.session.commit()
+        response_cache.invalidate_listing(listing_id)
         return self.get(listing_id) 
     
     @jwt_required()
@@ -243,8 +391,10 @@ class ListingResource(Resource):
         user_id = int(get_jwt_identity())
         listing = Listing.query.get_or_404(listing_id)
         if listing.owner_id != user_id: return {"success": False, "message": "Unauthorized"}, 403
+        record_listing_deleted(listing)
         db.session.delete(listing)
         db.session.commit()
+        response_cache.invalidate_listing(listing_id)
         return '', 204
 
 
@@ -258,7 +408,6 @@ class ListingImageUpload(Resource):
         files = request.files.getlist('images')
         if not files or files[0].filename == '': return {"success": False, "message": "No files selected"}, 400
 
-        uploaded_urls = []
         for file in files:
             if not allowed_file(file.filename):
                 return {"success": False, "message": f"Invalid file type: {file.filename}."}, 400
@@ -266,71 +415,170 @@ class ListingImageUpload(Resource):
             if file.tell() > MAX_CONTENT_LENGTH:
                 return {"success": False, "message": f"File too large: {file.filename}."}, 400
             file.seek(0)
-            upload_result = cloudinary.uploader.upload(file)
-            uploaded_urls.append(upload_result['secure_url'])
+
+        try:
+            uploaded_urls = upload_images(files)
+        except UploadError as e:
+            return {"success": False, "message": str(e)}, 500
 
         if listing.image_urls is None: listing.image_urls = []
         listing.image_urls.extend(uploaded_urls)
         flag_modified(listing, "image_urls")
         db.session.commit()
+        response_cache.invalidate_listing(listing_id)
         return {"success": True, "message": "Images added successfully", "image_urls": uploaded_urls}, 201
 
 
-class ListingSearch(Resource):
+LISTING_EXPORT_COLUMNS = [
+    'id', 'pid', 'title', 'description', 'street_address', 'city', 'state', 'pincode', 'propertyType',
+    'monthlyRent', 'securityDeposit', 'bedrooms', 'bathrooms', 'seating', 'area', 'furnishing',
+    'amenities', 'image_urls', 'ownerName', 'owner_id', 'is_verified', 'average_rating', 'review_count',
+    'latitude', 'longitude', 'created_at', 'updated_at'
+]
+
+class ListingExport(Resource):
     def get(self):
-        query = Listing.query
+        """Streams every listing in id order. Pass the last id received as after_id to resume."""
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in EXPORT_FORMATS:
+            return {"success": False, "message": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, 400
+        after_id = request.args.get('after_id', 0, type=int)
+
+        stmt = select(*[getattr(Listing, c) for c in LISTING_EXPORT_COLUMNS]).where(
+            Listing.id > after_id
+        ).order_by(Listing.id)
+        return stream_export(stmt, LISTING_EXPORT_COLUMNS, export_format, 'listings')
+
+
+def parse_search_location(args):
+    """Parses radius (near=lat,lon&radius_km=) and bounding box (bbox=) search params. Raises InvalidLocation."""
+    near = parse_near(args.get('near'), args.get('radius_km', type=float)) if args.get('near') else None
+    bbox = parse_bbox(args.get('bbox')) if args.get('bbox') else None
+    return near, bbox
+
+def apply_search_filters(query, args, near=None, bbox=None):
+    """
+    Applies the /listings/search filters to a select over listing, shared by the result page and the facets.
+    Returns (query, relevance, distance); relevance and distance are None unless keyword / near are given.
+    """
+    # filter by specific fields 
+    pid = args.get('pid')
+    if pid:
+        query = query.filter(Listing.pid.ilike(f'%{pid}%'))
+
+    owner_name = args.get('ownerName')
+    if owner_name:
+        query = query.filter(Listing.ownerName.ilike(f'%{owner_name}%'))
+
+    location = args.get('location')
+    if location:
+        query = query.filter(or_(
+            Listing.city.ilike(f'%{location}%'), 
+            Listing.state.ilike(f'%{location}%'),
+            Listing.pincode.ilike(f'%{location}%'), 
+            Listing.street_address.ilike(f'%{location}%')
+        ))
+
+    min_rent = args.get('min_rent', type=float)
+    if min_rent is not None:
+        query = query.filter(Listing.monthlyRent >= min_rent)
+    
+    max_rent = args.get('max_rent', type=float)
+    if max_rent is not None:
+        query = query.filter(Listing.monthlyRent <= max_rent)
+
+    amenities_str = args.get('amenities')
+    if amenities_str:
+        query = filter_by_amenities(query, amenities_str.split(','))
+
+    # full-text match, ranked by relevance unless an explicit sort is requested
+    relevance = None
+    keyword = args.get('keyword')
+    if keyword:
+        query, relevance = apply_keyword_search(query, keyword)
+
+    distance = None
+    if bbox:
+        query = filter_by_bbox(query, *bbox)
+    if near:
+        query, distance = filter_near(query, *near)
+    return query, relevance, distance
+
+def normalize_search_filters(args, near=None, bbox=None):
+    """Canonical, hashable form of the search filters, equal for requests that select the same listings."""
+    normalized = []
+    for name in ('pid', 'ownerName', 'location', 'keyword'):
+        value = ' '.join((args.get(name) or '').split()).lower()
+        if value: normalized.append((name, value))
+    for name in ('min_rent', 'max_rent'):
+        value = args.get(name, type=float)
+        if value is not None: normalized.append((name, value))
+    amenities = normalize_amenities((args.get('amenities') or '').split(','))
+    if amenities: normalized.append(('amenities', tuple(sorted(amenities))))
+    if near: normalized.append(('near', tuple(round(value, 6) for value in near)))
+    if bbox: normalized.append(('bbox', tuple(round(value, 6) for value in bbox)))
+    return tuple(normalized)
+
+def get_search_facets(args, near=None, bbox=None):
+    """Facet counts for the search filters, cached per normalized filter set until listings change."""
+    cache_key = ('listings', 'facets', normalize_search_filters(args, near, bbox))
+    facets = response_cache.get(cache_key)
+    if facets is None:
+        query, _, _ = apply_search_filters(facet_select(), args, near, bbox)
+        facets = compute_facets(query)
+        response_cache.set(cache_key, facets)
+    return facets
+
+
+def get_search_total(args, near=None, bbox=None):
+    """Number of listings matching the search filters across all pages, cached like the facets."""
+    cache_key = ('listings', 'total', normalize_search_filters(args, near, bbox))
+    total = response_cache.get(cache_key)
+    if total is None:
+        query, _, _ = apply_search_filters(select(Listing.id), args, near, bbox)
+        total = db.session.execute(select(func.count()).select_from(query.subquery())).scalar()
+        response_cache.set(cache_key, total)
+    return total
 
-        # filter by specific fields 
-        pid = request.args.get('pid')
-        if pid:
-            query = query.filter(Listing.pid.ilike(f'%{pid}%'))
-
-        owner_name = request.args.get('ownerName')
-        if owner_name:
-            query = query.filter(Listing.ownerName.ilike(f'%{owner_name}%'))
-
-        location = request.args.get('location')
-        if location:
-            query = query.filter(or_(
-                Listing.city.ilike(f'%{location}%'), 
-                Listing.state.ilike(f'%{location}%'),
-                Listing.pincode.ilike(f'%{location}%'), 
-                Listing.street_address.ilike(f'%{location}%')
-            ))
-
-        min_rent = request.args.get('min_rent', type=float)
-        if min_rent is not None:
-            query = query.filter(Listing.monthlyRent >= min_rent)
-        
-        max_rent = request.args.get('max_rent', type=float)
-        if max_rent is not None:
-            query = query.filter(Listing.monthlyRent <= max_rent)
-
-        amenities_str = request.args.get('amenities')
-        if amenities_str:
-            required_amenities = [amenity.strip() for amenity in amenities_str.split(',')]
-            for amenity in required_amenities:
-                query = query.filter(func.json_contains(Listing.amenities, f'"{amenity}"'))
-
-        keyword = request.args.get('keyword')
-        if keyword:
-            query = query.filter(or_(
-                Listing.title.ilike(f'%{keyword}%'), 
-                Listing.description.ilike(f'%{keyword}%'),
-                Listing.pid.ilike(f'%{keyword}%'),
-                Listing.ownerName.ilike(f'%{keyword}%') 
-            ))
 
-        sort_by = request.args.get('sort_by')
-        if sort_by == 'rent_asc':
-            query = query.order_by(Listing.monthlyRent.asc())
-        elif sort_by == 'rent_desc':
-            query = query.order_by(Listing.monthlyRent.desc())
-        
-        filtered_listings = query.all()
+class ListingSearch(Resource):
+    @jwt_required(optional=True)  # authentication optional, adds is_favorite
+    def get(self):
+        try:
+            fields = parse_listing_fields(request.args, LISTING_DETAIL_FIELDS)
+        except InvalidFieldset as e:
+            return {"success": False, "message": str(e)}, 400
+        try:
+            near, bbox = parse_search_location(request.args)
+        except InvalidLocation as e:
+            return {"success": False, "message": str(e)}, 400
+        extra_columns = LIST_VIEW_EXTRA_COLUMNS + ((Listing.latitude, Listing.longitude) if near else ())
+        query, serialize = listing_select(fields, *extra_columns)
+        query, relevance, distance = apply_search_filters(query, request.args, near, bbox)
+
+        try:
+            filtered_listings, next_cursor, has_more = paginate_listings(
+                query, request.args.get('sort_by'), request.args.get('cursor'),
+                get_page_size(request.args.get('limit', type=int)), relevance=relevance, distance=distance
+            )
+        except InvalidCursor as e:
+            return {"success": False, "message": str(e)}, 400
         
-        result = [serialize_listing_full_detail(l) for l in filtered_listings]
-        return {"success": True, "count": len(result), "data": result}
+        result = [serialize(row) for row in filtered_listings]
+        if near:
+            for data, row in zip(result, filtered_listings):
+                data["distance_km"] = round(haversine_km(near[0], near[1], row.latitude, row.longitude), 3)
+        current_user_id = get_jwt_identity()
+        if current_user_id:
+            result = apply_user_favorites(result, int(current_user_id))
+        # count is every match, not just this page
+        response = {
+            "success": True, "count": get_search_total(request.args, near, bbox), "data": result,
+            "next_cursor": next_cursor, "has_more": has_more
+        }
+        if request.args.get('facets', '').lower() in ('1', 'true'):
+            response["facets"] = get_search_facets(request.args, near, bbox)
+        return response
 
 
 class ReviewCreate(Resource):
@@ -369,7 +617,9 @@ class ReviewCreate(Resource):
             listing_id=listing_id
         )
         db.session.add(new_review)
+        record_review(listing_id, rating_int)
         db.session.commit()
+        response_cache.invalidate_listing(listing_id)
 
         review_data = {
             "id": new_review.id, 
@@ -399,15 +649,18 @@ class ListingVerification(Resource):
 
         listing.is_verified = is_verified_status
         db.session.commit()
+        response_cache.invalidate_listing(listing_id)
 
         return ListingResource().get(listing_id)
 
 
 api.add_resource(ListingCreate, "/listings/create")
+api.add_resource(ListingImport, "/listings/import")
 api.add_resource(ListingList, "/listings")
 api.add_resource(ListingResource, "/listings/<int:listing_id>")
 api.add_resource(ListingImageUpload, "/listings/<int:listing_id>/images")
 api.add_resource(ListingSearch, "/listings/search")
+api.add_resource(ListingExport, "/listings/export")
 api.add_resource(ReviewCreate, "/listings/<int:listing_id>/reviews")
 
 api.add_resource(ListingVerification, "/listings/<int:listing_id>/verify")
@@ -1,12 +1,16 @@
 from flask import request, Blueprint
 from flask_restful import Api, Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import func, cast, Date
+from sqlalchemy import func, select
 from sqlalchemy.orm import joinedload
 from datetime import date
 
 from ..extensions import db
-from ..models import User, Listing, Booking
+from ..models import User, Listing, Booking, ListingDailyOccupancy
+from ..utils.http_cache_utils import make_etag, latest, is_not_modified, conditional_headers
+from ..utils.occupancy_utils import get_attendees_by_listing
+from ..utils.owner_stats_utils import get_owner_stats
+from ..serializers import serialize_listing, LISTING_DASHBOARD_FIELDS
 
 owner_bp = Blueprint('owner', __name__)
 api = Api(owner_bp)
@@ -21,43 +25,39 @@ def serialize_tenant_for_dashboard(user):
         "gender": user.gender, "age": user.age, "profile_image_url": user.profile_image_url
     }
 
-def serialize_listing_for_dashboard(listing, status):
-    if not listing: return None
-    return {
-        "id": listing.id, "pid": listing.pid, "ownerName": listing.ownerName,
-        "is_verified": listing.is_verified, "title": listing.title,
-        "description": listing.description, "street_address": listing.street_address,
-        "city": listing.city, "state": listing.state, "pincode": listing.pincode,
-        "propertyType": listing.propertyType, "monthlyRent": listing.monthlyRent,
-        "securityDeposit": listing.securityDeposit, "bedrooms": listing.bedrooms,
-        "bathrooms": listing.bathrooms, "seating": listing.seating,
-        "area": listing.area, "furnishing": listing.furnishing,
-        "amenities": listing.amenities or [], "image_urls": listing.image_urls or [],
-        "created_at": listing.created_at.isoformat() if listing.created_at else None,
-        "availability_status": status 
-    }
-
-def serialize_booking_for_dashboard(booking):
+def serialize_booking_for_dashboard(booking, listing_data):
+    """listing_data is the listing's already serialized dashboard entry, shared with my_listings."""
     if not booking: return None
-    
-    today = date.today()
-    total_attendees_today = db.session.query(func.sum(Booking.attendees)).filter(
-        Booking.listing_id == booking.listing_id,
-        cast(Booking.created_at, Date) == today,
-        Booking.status.in_(['Confirmed', 'Pending'])
-    ).scalar() or 0
-    status = "Booked" if booking.listing.seating is not None and total_attendees_today >= booking.listing.seating else "Available"
-    
     return {
         "booking_id": booking.id,
         "booking_date": booking.created_at.date().isoformat(),
         "status": booking.status,
         "attendees": booking.attendees,
-        "listing": serialize_listing_for_dashboard(booking.listing, status), 
+        "listing": listing_data, 
         "tenant": serialize_tenant_for_dashboard(booking.tenant)
     }
 
 
+def get_dashboard_signal(user_id, today):
+    """
+    Version signal for an owner's dashboard in one round trip: their listings, the bookings on them,
+    occupancy of those listings and tenant profile updates. Returns (etag parts, last modified).
+    """
+    owned_ids = select(Listing.id).where(Listing.owner_id == user_id)
+    owned_bookings = Booking.listing_id.in_(owned_ids)
+    owned_occupancy = ListingDailyOccupancy.listing_id.in_(owned_ids)
+    row = db.session.query(
+        select(func.count(Listing.id)).where(Listing.owner_id == user_id).scalar_subquery(),
+        select(func.max(Listing.updated_at)).where(Listing.owner_id == user_id).scalar_subquery(),
+        select(func.count(Booking.id)).where(owned_bookings).scalar_subquery(),
+        select(func.max(Booking.id)).where(owned_bookings).scalar_subquery(),
+        select(func.max(Booking.updated_at)).where(owned_bookings).scalar_subquery(),
+        select(func.max(ListingDailyOccupancy.updated_at)).where(owned_occupancy).scalar_subquery(),
+        select(func.max(User.updated_at)).scalar_subquery()
+    ).one()
+    return (today, *row), latest(row[1], row[4], row[5], row[6])
+
+
 class OwnerDashboard(Resource):
     @jwt_required()
     def get(self):
@@ -68,54 +68,45 @@ class OwnerDashboard(Resource):
             return {"success": False, "message": "Access denied: Owner role required."}, 403
 
         today = date.today()
+        signal, last_modified = get_dashboard_signal(user_id, today)
+        etag = make_etag('dashboard', user_id, signal)
+        headers = conditional_headers(etag, last_modified)
+        if is_not_modified(etag, last_modified):
+            return '', 304, headers
+
         owner_listing_ids = db.session.query(Listing.id).filter(Listing.owner_id == user_id).scalar_subquery()
         
-        total_listings = db.session.query(func.count(Listing.id)).filter(Listing.owner_id == user_id).scalar() or 0
-        total_revenue = db.session.query(func.sum(Listing.monthlyRent)).join(
-            Booking, Booking.listing_id == Listing.id
-        ).filter(
-            Listing.owner_id == user_id,
-            Booking.status == 'Confirmed',
-            cast(Booking.created_at, Date) < today
-        ).scalar() or 0.0
-        total_bookings = db.session.query(func.count(Booking.id)).filter(
-            Booking.listing_id.in_(owner_listing_ids),
-            Booking.status == 'Confirmed'
-        ).scalar() or 0
+        # maintained by the listing and booking write paths, see owner_stats_utils
+        summary_stats = get_owner_stats(user_id)
         
         my_listings_query = Listing.query.filter(Listing.owner_id == user_id).order_by(Listing.title).all()
         
+        # availability is computed once per listing in a single lookup and shared by both sections
+        attendees_today = get_attendees_by_listing([l.id for l in my_listings_query], today)
+        listing_data_by_id = {}
         serialized_listings = []
         for l in my_listings_query:
-            total_attendees_today = db.session.query(func.sum(Booking.attendees)).filter(
-                Booking.listing_id == l.id,
-                cast(Booking.created_at, Date) == today,
-                Booking.status.in_(['Confirmed', 'Pending'])
-            ).scalar() or 0
+            total_attendees_today = attendees_today.get(l.id, 0)
             
             status = "Booked" if l.seating is not None and total_attendees_today >= l.seating else "Available"
             
-            serialized_listings.append(serialize_listing_for_dashboard(l, status))
+            listing_data_by_id[l.id] = serialize_listing(l, LISTING_DASHBOARD_FIELDS, availability_status=status)
+            serialized_listings.append(listing_data_by_id[l.id])
         
         all_bookings = Booking.query.filter(
             Booking.listing_id.in_(owner_listing_ids)
         ).options(
-            joinedload(Booking.listing),
             joinedload(Booking.tenant)
         ).order_by(Booking.created_at.desc()).all()
-        serialized_bookings_list = [serialize_booking_for_dashboard(b) for b in all_bookings]
+        serialized_bookings_list = [serialize_booking_for_dashboard(b, listing_data_by_id.get(b.listing_id)) for b in all_bookings]
         
         dashboard_data = {
-            "summary_stats": {
-                "total_listings": total_listings,
-                "total_bookings": total_bookings,
-                "total_revenue": round(total_revenue, 2)
-            },
+            "summary_stats": summary_stats,
             "all_bookings": [b for b in serialized_bookings_list if b is not None],
             "my_listings": serialized_listings 
         }
         
-        return {"success": True, "data": dashboard_data}
+        return {"success": True, "data": dashboard_data}, 200, headers
 
 
 api.add_resource(OwnerDashboard, "/owner/dashboard")
@@ -0,0 +1,173 @@
+from functools import lru_cache
+from sqlalchemy import select
+
+from .models import User, Listing
+
+
+class InvalidFieldset(ValueError):
+    pass
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _plain(value):
+    return value
+
+
+def _owner_from_values(owner_id, username, mobile_no, gender, age):
+    if owner_id is None: return None
+    return {"id": owner_id, "username": username, "mobile_no": mobile_no, "gender": gender, "age": age}
+
+
+OWNER_COLUMNS = (User.id, User.username, User.mobile_no, User.gender, User.age)
+
+def serialize_owner(owner):
+    if not owner: return None
+    return _owner_from_values(*[getattr(owner, column.key) for column in OWNER_COLUMNS])
+
+
+# field name -> (columns it reads, converter from those column values to the response value).
+# Fields map 1:1 to response keys. owner is the only field read through a relationship.
+LISTING_FIELDS = {name: ((getattr(Listing, name),), _plain) for name in (
+    'id', 'title', 'description', 'street_address', 'city', 'state', 'pincode', 'propertyType',
+    'monthlyRent', 'securityDeposit', 'bedrooms', 'bathrooms', 'seating', 'area', 'furnishing',
+    'pid', 'ownerName', 'is_verified', 'review_count', 'latitude', 'longitude'
+)}
+LISTING_FIELDS.update({
+    'amenities': ((Listing.amenities,), lambda value: value or []),
+    'created_at': ((Listing.created_at,), _iso),
+    'image_urls': ((Listing.image_urls,), lambda value: value or []),
+    'main_image_url': ((Listing.image_urls,), lambda value: (value or [None])[0]),
+    'average_rating': ((Listing.average_rating,), lambda value: round(float(value), 2) if value else None),
+    'owner': (OWNER_COLUMNS, _owner_from_values),
+})
+
+# computed by the caller per request and passed to the serializer as keyword arguments
+COMPUTED_LISTING_FIELDS = {
+    'availability_status': (Listing.seating,),
+}
+
+LISTING_BASE_FIELDS = (
+    'id', 'title', 'description', 'street_address', 'city', 'state', 'pincode', 'propertyType',
+    'monthlyRent', 'securityDeposit', 'bedrooms', 'bathrooms', 'seating', 'area', 'furnishing',
+    'amenities', 'pid', 'ownerName', 'is_verified', 'created_at', 'image_urls', 'latitude', 'longitude'
+)
+LISTING_DETAIL_FIELDS = LISTING_BASE_FIELDS + ('owner',)
+LISTING_LIST_FIELDS = LISTING_DETAIL_FIELDS + ('availability_status', 'average_rating', 'review_count')
+LISTING_DASHBOARD_FIELDS = LISTING_BASE_FIELDS + ('availability_status',)
+LISTING_CARD_FIELDS = (
+    'id', 'title', 'city', 'state', 'propertyType', 'monthlyRent', 'bedrooms', 'bathrooms', 'seating',
+    'furnishing', 'is_verified', 'main_image_url', 'average_rating', 'review_count', 'availability_status'
+)
+
+
+def _orm_getter(name):
+    if name == 'owner':
+        return lambda listing: serialize_owner(listing.owner)
+    columns, convert = LISTING_FIELDS[name]
+    key = columns[0].key
+    return lambda listing: convert(getattr(listing, key))
+
+
+@lru_cache(maxsize=128)
+def compile_listing_serializer(fields):
+    """
+    Builds a serializer for a fieldset (a tuple of field names) once and reuses it. The returned
+    function takes a Listing plus any computed fields as keyword arguments and returns a dict.
+    """
+    getters = tuple((name, _orm_getter(name)) for name in fields if name in LISTING_FIELDS)
+    computed = tuple(name for name in fields if name in COMPUTED_LISTING_FIELDS)
+
+    def serialize(listing, **values):
+        if not listing: return None
+        data = {name: get(listing) for name, get in getters}
+        for name in computed:
+            data[name] = values.get(name)
+        return data
+    return serialize
+
+
+def serialize_listing(listing, fields=LISTING_DETAIL_FIELDS, **values):
+    return compile_listing_serializer(fields)(listing, **values)
+
+
+@lru_cache(maxsize=128)
+def compile_listing_row_serializer(fields, extra=()):
+    """
+    Column-tuple counterpart of compile_listing_serializer for Core selects. Returns (columns, serialize):
+    columns lists what to select, each column once and labeled with its attribute name (owner columns
+    prefixed owner_), the fieldset's columns first and then extra. serialize builds the dict straight
+    from a row that starts with those columns.
+    """
+    positions = {}
+    columns = []
+
+    def position(column):
+        if column not in positions:
+            positions[column] = len(columns)
+            label = f"owner_{column.key}" if column.class_ is User else column.key
+            columns.append(column.label(label))
+        return positions[column]
+
+    converters = []
+    computed = []
+    for name in fields:
+        if name in COMPUTED_LISTING_FIELDS:
+            for column in COMPUTED_LISTING_FIELDS[name]: position(column)
+            computed.append(name)
+            continue
+        field_columns, convert = LISTING_FIELDS[name]
+        indexes = tuple(position(column) for column in field_columns)
+        converters.append((name, convert, indexes[0], indexes if len(indexes) > 1 else None))
+    for column in extra:
+        position(column)
+    converters, computed = tuple(converters), tuple(computed)
+
+    def serialize(row, **values):
+        data = {}
+        for name, convert, index, indexes in converters:
+            data[name] = convert(row[index]) if indexes is None else convert(*[row[i] for i in indexes])
+        for name in computed:
+            data[name] = values.get(name)
+        return data
+    return tuple(columns), serialize
+
+
+def listing_select(fields, *extra):
+    """
+    Core select of just a fieldset's columns (plus extra ones the caller needs), joined to the owner
+    only when it is requested. Returns (select, row serializer).
+    """
+    columns, serialize = compile_listing_row_serializer(fields, extra)
+    stmt = select(*columns).select_from(Listing)
+    if 'owner' in fields:
+        stmt = stmt.outerjoin(User, User.id == Listing.owner_id)
+    return stmt, serialize
+
+
+def parse_listing_fields(args, default=LISTING_DETAIL_FIELDS):
+    """
+    Resolves ?fields=a,b,c or ?view=card|full against the fields an endpoint can return (its default).
+    id is always included. Raises InvalidFieldset for unknown names.
+    """
+    available = default
+    if 'image_urls' in default and 'main_image_url' not in default:
+        available = default + ('main_image_url',)
+
+    requested = args.get('fields')
+    if requested:
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise InvalidFieldset(f"Unknown field(s): {', '.join(unknown)}")
+        return tuple(name for name in available if name == 'id' or name in names)
+
+    view = args.get('view', 'full')
+    if view == 'card':
+        return tuple(name for name in LISTING_CARD_FIELDS if name in available)
+    if view != 'full':
+        raise InvalidFieldset("view must be one of: card, full")
+    return default
+
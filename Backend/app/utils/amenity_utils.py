@@ -0,0 +1,61 @@
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import Amenity, Listing, listing_amenity_table
+
+
+def normalize_amenities(names):
+    """Returns the distinct, normalized amenity names from a client supplied list."""
+    if not isinstance(names, (list, tuple)):
+        return []
+    normalized = []
+    for name in names:
+        if not isinstance(name, str): continue
+        key = name.strip().lower()
+        if key and key not in normalized:
+            normalized.append(key)
+    return normalized
+
+
+def get_or_create_amenities(keys):
+    if not keys: return []
+    existing = {a.name: a for a in Amenity.query.filter(Amenity.name.in_(keys)).all()}
+    for key in keys:
+        if key in existing: continue
+        try:
+            with db.session.begin_nested():
+                amenity = Amenity(name=key)
+                db.session.add(amenity)
+        except IntegrityError:
+            # created concurrently by another request
+            amenity = Amenity.query.filter_by(name=key).one()
+        existing[key] = amenity
+    return [existing[key] for key in keys]
+
+
+def sync_listing_amenities(listing):
+    """Rebuilds the listing's amenity links from its amenities JSON."""
+    listing.amenity_tags = get_or_create_amenities(normalize_amenities(listing.amenities))
+
+
+def filter_by_amenities(query, names):
+    """Keeps listings that have ALL of the given amenities, using the listing_amenity index."""
+    keys = normalize_amenities(names)
+    if not keys:
+        return query
+    matching_ids = select(listing_amenity_table.c.listing_id).join(
+        Amenity, Amenity.id == listing_amenity_table.c.amenity_id
+    ).where(Amenity.name.in_(keys)).group_by(
+        listing_amenity_table.c.listing_id
+    ).having(func.count() == len(keys))
+    return query.filter(Listing.id.in_(matching_ids))
+
+
+def rebuild_amenity_links():
+    """Re-derives every listing's amenity links from the amenities JSON. Returns listings processed."""
+    listings = Listing.query.all()
+    for listing in listings:
+        sync_listing_amenities(listing)
+    db.session.commit()
+    return len(listings)
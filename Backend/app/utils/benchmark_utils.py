@@ -0,0 +1,195 @@
+import os
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+from random import Random
+from concurrent.futures import ThreadPoolExecutor
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert, select, delete, func
+from sqlalchemy.orm import joinedload
+
+from ..extensions import db
+from ..models import User, Listing, Booking, ListingDailyOccupancy
+from .occupancy_utils import ACTIVE_BOOKING_STATUSES
+from ..serializers import serialize_listing, listing_select, LISTING_DETAIL_FIELDS
+
+
+class StressTestError(Exception):
+    pass
+
+
+def _best_cpu_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark_list_serialization(rows=2000, repeat=5, fields=LISTING_DETAIL_FIELDS):
+    """
+    Compares CPU time per row of the ORM read path (full Listing objects with the owner joined, then
+    serialized) against the Core column-tuple path used by the list endpoints. Synthetic listings are
+    inserted in a transaction that is rolled back afterwards. Returns a dict of timings in microseconds.
+    """
+    try:
+        owner = User(username='__benchmark_owner__', email='benchmark@example.invalid', mobile_no='9000000000',
+                     password='-', role='owner', is_verified=True)
+        db.session.add(owner)
+        db.session.flush()
+        owner_id = owner.id
+        db.session.execute(insert(Listing), [{
+            "title": f"Benchmark listing {i}", "description": "Spacious flat close to the market. " * 8,
+            "street_address": f"{i} Mall Road", "city": "Solan", "state": "Himachal Pradesh", "pincode": "173212",
+            "propertyType": "Apartment", "monthlyRent": 8000 + i % 50 * 100, "securityDeposit": 16000,
+            "bedrooms": 2, "bathrooms": 1, "seating": 4, "area": "900 sqft", "furnishing": "Semi-Furnished",
+            "amenities": ["wifi", "parking", "power backup"], "ownerName": "Benchmark",
+            "image_urls": [f"https://example.invalid/{i}/{n}.jpg" for n in range(5)], "owner_id": owner_id
+        } for i in range(rows)])
+
+        def orm_path():
+            # a fresh identity map, as in a new request
+            db.session.expunge_all()
+            listings = Listing.query.options(joinedload(Listing.owner)).filter(Listing.owner_id == owner_id).all()
+            return [serialize_listing(listing, fields) for listing in listings]
+
+        def core_path():
+            stmt, serialize = listing_select(fields)
+            return [serialize(row) for row in db.session.execute(stmt.where(Listing.owner_id == owner_id)).all()]
+
+        assert orm_path() == core_path(), "ORM and column-tuple paths disagree"
+        orm_seconds = _best_cpu_time(orm_path, repeat)
+        core_seconds = _best_cpu_time(core_path, repeat)
+    finally:
+        db.session.rollback()
+
+    return {
+        "rows": rows,
+        "orm_us_per_row": orm_seconds / rows * 1e6,
+        "core_us_per_row": core_seconds / rows * 1e6,
+        "speedup": orm_seconds / core_seconds if core_seconds else None,
+    }
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def stress_test_bookings(app, database_uri=None, listings=5, seating=20, users=100, workers=16, max_attendees=3):
+    """
+    Fires POST /bookings/create for every (user, listing) pair from concurrent threads, each through its own
+    test client and database connection, then checks that no listing went past its seating and that the
+    occupancy counters match the bookings. Returns a dict of counts and timings.
+    The synthetic rows have to be committed for the threads to see them, so this never touches app's
+    database: it builds a second app on database_uri, which must not hold any users, or on a temporary
+    SQLite file that is removed afterwards.
+    """
+    from .. import create_app
+
+    if database_uri and database_uri == app.config.get('SQLALCHEMY_DATABASE_URI'):
+        raise StressTestError("The stress test needs its own database, not the application's")
+    directory = None
+    if not database_uri:
+        directory = tempfile.mkdtemp(prefix='nest-stress-')
+        database_uri = f"sqlite:///{os.path.join(directory, 'stress.db')}"
+    settings = {key: value for key, value in app.config.items() if key.isupper()}
+    settings.update(SQLALCHEMY_DATABASE_URI=database_uri, METRICS_ENABLED=False, QUERY_STATS_ENABLED=False)
+
+    try:
+        stress_app = create_app(type('StressTestConfig', (), settings))
+        with stress_app.app_context():
+            try:
+                if db.session.scalar(select(func.count(User.id))):
+                    raise StressTestError("The stress test database must be empty")
+                return _book_concurrently(stress_app, listings, seating, users, workers, max_attendees)
+            finally:
+                db.session.remove()
+                db.engine.dispose()
+    finally:
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def _book_concurrently(app, listings, seating, users, workers, max_attendees):
+    tag = uuid.uuid4().hex[:8]
+    owner = User(username=f'__stress_owner_{tag}__', email=f'stress-owner-{tag}@example.invalid',
+                 mobile_no='9000000000', password='-', role='owner', is_verified=True)
+    db.session.add(owner)
+    db.session.flush()
+    owner_id = owner.id
+    db.session.execute(insert(Listing), [{
+        "title": f"Stress listing {i}", "street_address": f"{i} Mall Road", "city": "Solan", "state": "Himachal Pradesh",
+        "pincode": "173212", "propertyType": "Apartment", "monthlyRent": 8000, "securityDeposit": 16000,
+        "bedrooms": 2, "bathrooms": 1, "seating": seating, "owner_id": owner_id
+    } for i in range(listings)])
+    db.session.execute(insert(User), [{
+        "username": f"__stress_user_{tag}_{i}__", "email": f"stress-{tag}-{i}@example.invalid",
+        "mobile_no": "9000000000", "password": "-", "role": "user", "is_verified": True
+    } for i in range(users)])
+    db.session.commit()
+
+    listing_ids = db.session.scalars(select(Listing.id).where(Listing.owner_id == owner_id)).all()
+    user_ids = db.session.scalars(select(User.id).where(User.username.like(f"__stress_user_{tag}_%"))).all()
+    random = Random(tag)
+    requests = [
+        (create_access_token(identity=str(user_id)), listing_id, random.randint(1, max_attendees))
+        for user_id in user_ids for listing_id in listing_ids
+    ]
+    random.shuffle(requests)
+
+    local = threading.local()
+
+    def book(request):
+        token, listing_id, attendees = request
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        start = time.perf_counter()
+        response = local.client.post('/bookings/create', json={"listing_id": listing_id, "attendees": attendees},
+                                     headers={"Authorization": f"Bearer {token}"})
+        return response.status_code, time.perf_counter() - start
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(book, requests))
+        elapsed = time.perf_counter() - started
+
+        db.session.expire_all()
+        booked = dict(db.session.execute(
+            select(Booking.listing_id, func.sum(Booking.attendees)).where(
+                Booking.listing_id.in_(listing_ids), Booking.status.in_(ACTIVE_BOOKING_STATUSES)
+            ).group_by(Booking.listing_id)
+        ).all())
+        counted = dict(db.session.execute(
+            select(ListingDailyOccupancy.listing_id, func.sum(ListingDailyOccupancy.attendees))
+            .where(ListingDailyOccupancy.listing_id.in_(listing_ids)).group_by(ListingDailyOccupancy.listing_id)
+        ).all())
+    finally:
+        db.session.rollback()
+        db.session.execute(delete(Booking).where(Booking.listing_id.in_(listing_ids)))
+        db.session.execute(delete(ListingDailyOccupancy).where(ListingDailyOccupancy.listing_id.in_(listing_ids)))
+        db.session.execute(delete(Listing).where(Listing.owner_id == owner_id))
+        db.session.execute(delete(User).where(User.id.in_(user_ids + [owner_id])))
+        db.session.commit()
+
+    statuses = {}
+    for status, _ in outcomes:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = sorted(latency for _, latency in outcomes)
+    return {
+        "requests": len(outcomes),
+        "statuses": statuses,
+        "seconds": elapsed,
+        "requests_per_second": len(outcomes) / elapsed if elapsed else None,
+        "p50_ms": _percentile(latencies, 0.5) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "seats_booked": sum(booked.values()),
+        "seats_available": seating * len(listing_ids),
+        "overbooked_listings": sum(1 for total in booked.values() if total > seating),
+        "occupancy_mismatches": sum(1 for listing_id in listing_ids if booked.get(listing_id, 0) != counted.get(listing_id, 0)),
+    }
@@ -0,0 +1,106 @@
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import and_, or_, delete, exists, false, text
+
+from ..extensions import db
+from ..models import TokenBlocklist, User, utcnow
+
+
+class TokenBlocklistCache:
+    """
+    In-memory set of revoked jtis, so the per-request blocklist check rarely touches the database.
+    The set is topped up incrementally from TokenBlocklist.created_at at most once every
+    JWT_BLOCKLIST_REFRESH_SECONDS, and fully reloaded every JWT_BLOCKLIST_RELOAD_SECONDS to
+    forget pruned entries. Revocations made by this process are visible immediately; revocations
+    made by other workers show up within one refresh interval.
+    """
+
+    # re-read rows this far behind the watermark, to pick up rows committed out of timestamp order
+    OVERLAP = timedelta(seconds=5)
+
+    def __init__(self):
+        self._jtis = set()
+        self._watermark = None
+        self._next_refresh = 0
+        self._next_reload = 0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        self._refresh_if_stale()
+        return jti in self._jtis
+
+    def add(self, jti):
+        self._jtis.add(jti)
+
+    def _refresh_if_stale(self):
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return
+        with self._lock:
+            if now < self._next_refresh:
+                return
+            full_reload = now >= self._next_reload
+            query = db.session.query(TokenBlocklist.jti, TokenBlocklist.created_at)
+            if not full_reload and self._watermark is not None:
+                query = query.filter(TokenBlocklist.created_at >= self._watermark - self.OVERLAP)
+            rows = query.all()
+
+            jtis = set() if full_reload else self._jtis
+            jtis.update(jti for jti, _ in rows)
+            newest = max((created_at for _, created_at in rows if created_at), default=None)
+            if full_reload:
+                self._watermark = newest
+                self._next_reload = now + current_app.config['JWT_BLOCKLIST_RELOAD_SECONDS']
+            elif newest and (self._watermark is None or newest > self._watermark):
+                self._watermark = newest
+            self._jtis = jtis
+            self._next_refresh = now + current_app.config['JWT_BLOCKLIST_REFRESH_SECONDS']
+
+
+blocklist_cache = TokenBlocklistCache()
+
+
+def revoke_token(jwt_payload):
+    """Adds the token to the blocklist in the caller's transaction and to this process's cache."""
+    exp = jwt_payload.get("exp")
+    expires_at = datetime.fromtimestamp(exp, timezone.utc).replace(tzinfo=None) if exp else None
+    user_id = jwt_payload.get("sub")
+    db.session.add(TokenBlocklist(
+        jti=jwt_payload["jti"], created_at=utcnow(), expires_at=expires_at,
+        user_id=int(user_id) if str(user_id).isdigit() else None
+    ))
+    blocklist_cache.add(jwt_payload["jti"])
+
+
+def _user_ids_reused():
+    """
+    True if the database may hand a deleted user's id to a new account. SQLite does so for a table
+    created without AUTOINCREMENT, i.e. a `user` table that predates its sqlite_autoincrement flag.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    sql = db.session.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": User.__tablename__}
+    ).scalar()
+    return 'AUTOINCREMENT' not in (sql or '').upper()
+
+
+def prune_token_blocklist():
+    """
+    Deletes entries whose token can no longer be used: it has expired, or its user has been deleted.
+    Access tokens never expire (JWT_ACCESS_TOKEN_EXPIRES is False), so in practice the second rule does
+    the pruning. It is skipped where user ids can be reissued, since the pruned token would then
+    authenticate as the new account. Returns rows deleted.
+    """
+    expired = and_(TokenBlocklist.expires_at.isnot(None), TokenBlocklist.expires_at < utcnow())
+    user_deleted = false() if _user_ids_reused() else and_(
+        TokenBlocklist.user_id.isnot(None),
+        ~exists().where(User.id == TokenBlocklist.user_id)
+    )
+    deleted = db.session.execute(
+        delete(TokenBlocklist).where(or_(expired, user_deleted)).execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return deleted
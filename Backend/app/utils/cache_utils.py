@@ -0,0 +1,72 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache with a TTL for serialized response payloads.
+    Entries are process local, the TTL bounds how long another worker can serve a stale copy.
+    Keys are tuples whose first item is the kind of payload, so a whole kind can be dropped at once.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.max_entries = 0
+        self.ttl = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.max_entries = app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 512)
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 30)
+        self.clear()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_listing(self, listing_id=None):
+        """Drops a listing's detail payload (every one when no id is given) and all cached listing pages."""
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == 'listings' or (key[0] == 'listing' and listing_id in (None, key[1])):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled, "size": len(self._entries), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None
+            }
@@ -1,18 +1,29 @@
+import socket
+import smtplib
+from datetime import timedelta
 from flask import url_for, current_app
 from flask_mail import Message
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired
 
+from ..extensions import db
+from ..models import OutboundEmail, utcnow
 
-def send_verification_email(mail, email):
+
+def enqueue_email(recipient, subject, body):
+    """Adds a message to the outbound queue in the caller's transaction; the worker sends it."""
+    email = OutboundEmail(recipient=recipient, subject=subject, body=body)
+    db.session.add(email)
+    return email
+
+
+def queue_verification_email(email):
     s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
     token = s.dumps(email, salt='email-confirm')
 
     frontend_url = current_app.config['FRONTEND_URL']
     link = f"{frontend_url}/verify-email/{token}"
     
-    msg = Message("Confirm Your Email", recipients=[email])
-    msg.body = f'Your confirmation link is {link}'
-    mail.send(msg)
+    return enqueue_email(email, "Confirm Your Email", f'Your confirmation link is {link}')
 
 
 def confirm_email_token(token, expiration=3600):
@@ -25,16 +36,14 @@ def confirm_email_token(token, expiration=3600):
     return email
 
 
-def send_password_reset_email(mail, email):
+def queue_password_reset_email(email):
     s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
     token = s.dumps(email, salt='password-reset')
 
     frontend_url = current_app.config['FRONTEND_URL']
     link = f"{frontend_url}/reset-password/{token}"
     
-    msg = Message("Password Reset Request", recipients=[email])
-    msg.body = f'To reset your password, visit the following link: {link}'
-    mail.send(msg)
+    return enqueue_email(email, "Password Reset Request", f'To reset your password, visit the following link: {link}')
 
 
 def confirm_password_reset_token(token, expiration=3600):
@@ -48,4 +57,56 @@ def confirm_password_reset_token(token, expiration=3600):
     return email
 
 
+def _schedule_retry(email, error):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= current_app.config['EMAIL_MAX_ATTEMPTS']:
+        email.status = "Failed"
+    else:
+        # exponential backoff: base, 2x base, 4x base...
+        delay = current_app.config['EMAIL_RETRY_BASE_SECONDS'] * (2 ** (email.attempts - 1))
+        email.next_attempt_at = utcnow() + timedelta(seconds=delay)
+
+
+def deliver_queued_emails(mail, batch_size=None):
+    """
+    Sends one batch of due queued emails over a single SMTP connection.
+    Failed messages are retried with backoff. Returns (sent, retried).
+    """
+    batch_size = batch_size or current_app.config['EMAIL_BATCH_SIZE']
+    query = OutboundEmail.query.filter(
+        OutboundEmail.status == "Pending",
+        OutboundEmail.next_attempt_at <= utcnow()
+    ).order_by(OutboundEmail.next_attempt_at, OutboundEmail.id).limit(batch_size)
+    # lets several workers drain the queue without claiming the same rows (ignored by SQLite)
+    batch = query.with_for_update(skip_locked=True).all()
+    if not batch:
+        return 0, 0
+
+    sent, retried = 0, 0
+    pending = list(batch)
+    try:
+        with mail.connect() as conn:
+            while pending:
+                email = pending[0]
+                try:
+                    conn.send(Message(email.subject, recipients=[email.recipient], body=email.body))
+                except (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout):
+                    # the connection is gone, the rest of the batch is retried below
+                    raise
+                except Exception as e:
+                    # refused recipient, rejected data...: only this message is retried
+                    _schedule_retry(email, e)
+                    retried += 1
+                else:
+                    email.status = "Sent"
+                    email.sent_at = utcnow()
+                    sent += 1
+                pending.pop(0)
+    except Exception as e:
+        for email in pending:
+            _schedule_retry(email, e)
+            retried += 1
 
+    db.session.commit()
+    return sent, retried
@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from flask import current_app, Response, stream_with_context
+
+from ..extensions import db
+
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _csv_value(value):
+    # lists (amenities, image_urls) go into a single cell as JSON
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _ndjson_chunks(rows, columns, chunk_rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(columns, row)), default=_json_default))
+        if len(lines) >= chunk_rows:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def _csv_chunks(rows, columns, chunk_rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    pending = 0
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def stream_export(stmt, columns, export_format, filename):
+    """
+    Streams the rows of a Core select as NDJSON or CSV. Rows come off a server side cursor
+    EXPORT_BATCH_SIZE at a time and are written out as they arrive, so memory does not grow with the table.
+    """
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+
+    def generate():
+        result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+        try:
+            chunks = _csv_chunks if export_format == 'csv' else _ndjson_chunks
+            yield from chunks(result, columns, batch_size)
+        finally:
+            result.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
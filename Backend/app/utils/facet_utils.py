@@ -0,0 +1,62 @@
+from flask import current_app
+from sqlalchemy import select, union_all, literal, case, cast, func, String
+
+from ..extensions import db
+from ..models import Listing
+
+
+# facet name -> listing column, counted per distinct value
+FACET_COLUMNS = {
+    'city': Listing.city,
+    'propertyType': Listing.propertyType,
+    'furnishing': Listing.furnishing,
+    'bedrooms': Listing.bedrooms,
+}
+RENT_FACET = 'rent'
+
+
+def _rent_bucket_labels(bounds):
+    lower = [0] + bounds
+    return [f"{low}-{high}" for low, high in zip(lower, bounds)] + [f"{bounds[-1]}+"]
+
+
+def _rent_bucket(bounds):
+    labels = _rent_bucket_labels(bounds)
+    return case(*[(Listing.monthlyRent < bound, label) for bound, label in zip(bounds, labels)], else_=labels[-1])
+
+
+def facet_select():
+    """Narrow projection the search filters are applied to before counting: just the faceted values."""
+    bounds = current_app.config['FACET_RENT_BUCKETS']
+    return select(
+        *[column.label(name) for name, column in FACET_COLUMNS.items()],
+        _rent_bucket(bounds).label(RENT_FACET)
+    ).select_from(Listing)
+
+
+def compute_facets(filtered):
+    """
+    Counts every facet over the filtered projection in a single grouped UNION ALL round trip.
+    Returns {facet: [{"value", "count"}]}, most frequent first (rent in bucket order), at most
+    FACET_MAX_VALUES values per facet.
+    """
+    matches = filtered.subquery()
+    names = list(FACET_COLUMNS) + [RENT_FACET]
+    rows = db.session.execute(union_all(*[
+        select(literal(name).label('facet'), cast(matches.c[name], String).label('value'), func.count().label('count'))
+        .where(matches.c[name].isnot(None)).group_by(matches.c[name])
+        for name in names
+    ])).all()
+
+    max_values = current_app.config['FACET_MAX_VALUES']
+    bucket_order = {label: i for i, label in enumerate(_rent_bucket_labels(current_app.config['FACET_RENT_BUCKETS']))}
+    facets = {name: [] for name in names}
+    for facet, value, count in rows:
+        facets[facet].append({"value": int(value) if facet == 'bedrooms' else value, "count": count})
+    for name, values in facets.items():
+        if name == RENT_FACET:
+            values.sort(key=lambda v: bucket_order[v["value"]])
+        else:
+            values.sort(key=lambda v: (-v["count"], str(v["value"])))
+            del values[max_values:]
+    return facets
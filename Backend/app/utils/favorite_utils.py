@@ -0,0 +1,45 @@
+from sqlalchemy import select, insert, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import favorites_association_table
+
+
+favorites = favorites_association_table.c
+
+
+def add_favorite(user_id, listing_id):
+    """
+    Links the listing to the user with a single insert that skips an existing (user_id, listing_id) key,
+    so membership is never checked by loading the user's favorites. Returns False if it was already one.
+    """
+    values = {"user_id": user_id, "listing_id": listing_id}
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        stmt = sqlite_insert(favorites_association_table).values(**values).on_conflict_do_nothing()
+        return db.session.execute(stmt).rowcount > 0
+    if dialect == 'mysql':
+        stmt = insert(favorites_association_table).values(**values).prefix_with('IGNORE')
+        return db.session.execute(stmt).rowcount > 0
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(favorites_association_table).values(**values))
+    except IntegrityError:
+        return False
+    return True
+
+
+def remove_favorite(user_id, listing_id):
+    """Unlinks the listing from the user. Returns False if it was not a favorite."""
+    stmt = delete(favorites_association_table).where(favorites.user_id == user_id, favorites.listing_id == listing_id)
+    return db.session.execute(stmt).rowcount > 0
+
+
+def get_favorite_listing_ids(user_id, listing_ids=None):
+    """Returns the listing ids (within listing_ids, if given) the user has favorited, in one indexed lookup."""
+    if not user_id or listing_ids == []: return set()
+    stmt = select(favorites.listing_id).where(favorites.user_id == user_id)
+    if listing_ids is not None:
+        stmt = stmt.where(favorites.listing_id.in_(listing_ids))
+    return {listing_id for (listing_id,) in db.session.execute(stmt)}
@@ -0,0 +1,196 @@
+import math
+from flask import current_app
+from sqlalchemy import event, func, and_, or_
+
+from ..extensions import db
+from ..models import Listing
+
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9  # ~5 m cells, stored in Listing.geo_cell
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# sorts after every geohash character, so [prefix, prefix + _PREFIX_END) is the range of one cell
+_PREFIX_END = '{'
+_KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+class InvalidLocation(ValueError):
+    pass
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def _cell_size(precision):
+    """(height, width) in degrees of a geohash cell."""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    if None in (lat1, lon1, lat2, lon2): return None
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def register_geo_functions(engine):
+    """SQLite has no trigonometry without extensions, give every new connection a haversine_km() function."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _register(dbapi_connection, connection_record):
+        dbapi_connection.create_function('haversine_km', 4, haversine_km, deterministic=True)
+
+
+def parse_coordinates(latitude, longitude):
+    """Validated (latitude, longitude) floats, or (None, None) when both are missing."""
+    if latitude in (None, '') and longitude in (None, ''):
+        return None, None
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise InvalidLocation("latitude and longitude must both be numbers")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise InvalidLocation("latitude must be within [-90, 90] and longitude within [-180, 180]")
+    return latitude, longitude
+
+
+def set_listing_location(listing):
+    """Validates the listing's coordinates and recomputes its geo_cell. Raises InvalidLocation."""
+    listing.latitude, listing.longitude = parse_coordinates(listing.latitude, listing.longitude)
+    listing.geo_cell = None if listing.latitude is None else encode_geohash(listing.latitude, listing.longitude)
+
+
+def parse_near(near, radius_km):
+    """Parses near=lat,lon and radius_km, clamped to GEO_MAX_RADIUS_KM. Returns (latitude, longitude, radius)."""
+    parts = (near or '').split(',')
+    if len(parts) != 2:
+        raise InvalidLocation("near must be given as lat,lon")
+    latitude, longitude = parse_coordinates(*parts)
+    radius = current_app.config['GEO_DEFAULT_RADIUS_KM'] if radius_km is None else radius_km
+    if radius <= 0:
+        raise InvalidLocation("radius_km must be positive")
+    return latitude, longitude, min(radius, current_app.config['GEO_MAX_RADIUS_KM'])
+
+
+def parse_bbox(bbox):
+    """Parses bbox=min_lat,min_lon,max_lat,max_lon."""
+    parts = (bbox or '').split(',')
+    if len(parts) != 4:
+        raise InvalidLocation("bbox must be given as min_lat,min_lon,max_lat,max_lon")
+    min_lat, min_lon = parse_coordinates(parts[0], parts[1])
+    max_lat, max_lon = parse_coordinates(parts[2], parts[3])
+    if min_lat > max_lat or min_lon > max_lon:
+        raise InvalidLocation("bbox minimums must not exceed its maximums")
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def bbox_around(latitude, longitude, radius_km):
+    """
+    Smallest lat/lon boxes containing the circle, as a list of (min_lat, min_lon, max_lat, max_lon).
+    A circle crossing the antimeridian gets one box on each side of it.
+    """
+    dlat = radius_km / _KM_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(latitude))
+    dlon = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+    min_lat, max_lat = max(-90.0, latitude - dlat), min(90.0, latitude + dlat)
+    west, east = longitude - dlon, longitude + dlon
+    if dlon >= 180.0:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    if west < -180.0:
+        return [(min_lat, west + 360.0, max_lat, 180.0), (min_lat, -180.0, max_lat, east)]
+    if east > 180.0:
+        return [(min_lat, west, max_lat, 180.0), (min_lat, -180.0, max_lat, east - 360.0)]
+    return [(min_lat, west, max_lat, east)]
+
+
+def covering_cells(min_lat, min_lon, max_lat, max_lon):
+    """
+    Geohash prefixes that together cover the box, at the finest precision needing no more
+    than GEO_MAX_CELLS of them.
+    """
+    max_cells = current_app.config['GEO_MAX_CELLS']
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _cell_size(precision)
+        rows = int((max_lat + 90) // height) - int((min_lat + 90) // height) + 1
+        cols = int((max_lon + 180) // width) - int((min_lon + 180) // width) + 1
+        if rows * cols <= max_cells or precision == 1:
+            break
+    cells = set()
+    first_row, first_col = int((min_lat + 90) // height), int((min_lon + 180) // width)
+    for row in range(first_row, first_row + rows):
+        center_lat = min(90.0, -90 + (row + 0.5) * height)
+        for col in range(first_col, first_col + cols):
+            center_lon = min(180.0, -180 + (col + 0.5) * width)
+            cells.add(encode_geohash(center_lat, center_lon, precision))
+    return sorted(cells)
+
+
+def distance_expression(latitude, longitude):
+    """Great-circle distance in km from a point to the listing, as a SQL expression."""
+    if db.engine.dialect.name == 'sqlite':
+        return func.haversine_km(latitude, longitude, Listing.latitude, Listing.longitude)
+    dlat = func.radians(Listing.latitude - latitude)
+    dlon = func.radians(Listing.longitude - longitude)
+    a = func.power(func.sin(dlat / 2), 2) + math.cos(math.radians(latitude)) * func.cos(
+        func.radians(Listing.latitude)
+    ) * func.power(func.sin(dlon / 2), 2)
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(a))
+
+
+def _in_box(min_lat, min_lon, max_lat, max_lon):
+    """Condition for a listing inside the box, narrowed through the geo_cell index first."""
+    cells = covering_cells(min_lat, min_lon, max_lat, max_lon)
+    return and_(
+        or_(*[and_(Listing.geo_cell >= cell, Listing.geo_cell < cell + _PREFIX_END) for cell in cells]),
+        Listing.latitude.between(min_lat, max_lat),
+        Listing.longitude.between(min_lon, max_lon)
+    )
+
+
+def filter_by_bbox(query, min_lat, min_lon, max_lat, max_lon):
+    """Keeps listings inside the box."""
+    return query.where(_in_box(min_lat, min_lon, max_lat, max_lon))
+
+
+def filter_near(query, latitude, longitude, radius_km):
+    """
+    Keeps listings within radius_km of the point: index pruning on the covering cells and the box(es)
+    around the circle, then the exact haversine check. Returns (query, distance expression).
+    """
+    query = query.where(or_(*[_in_box(*box) for box in bbox_around(latitude, longitude, radius_km)]))
+    distance = distance_expression(latitude, longitude)
+    return query.where(distance <= radius_km), distance
+
+
+def reindex_geo_cells():
+    """Recomputes geo_cell for every listing from its coordinates. Returns the number of listings changed."""
+    changed = 0
+    for listing in Listing.query.all():
+        cell = None if listing.latitude is None or listing.longitude is None else encode_geohash(listing.latitude, listing.longitude)
+        if listing.geo_cell != cell:
+            listing.geo_cell = cell
+            changed += 1
+    db.session.commit()
+    return changed
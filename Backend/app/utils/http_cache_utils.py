@@ -0,0 +1,31 @@
+import hashlib
+from datetime import timezone
+from flask import request
+from werkzeug.http import http_date
+
+
+def make_etag(*parts):
+    """Hashes a version signal (ids, counts, timestamps...) into an ETag value."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def latest(*timestamps):
+    present = [t for t in timestamps if t is not None]
+    return max(present) if present else None
+
+
+def is_not_modified(etag, last_modified=None):
+    """Evaluates If-None-Match, falling back to If-Modified-Since when no ETag was sent."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= request.if_modified_since
+    return False
+
+
+def conditional_headers(etag, last_modified=None):
+    # no-cache: clients may store the payload but must revalidate it on every poll
+    headers = {"ETag": f'W/"{etag}"', "Cache-Control": "no-cache", "Vary": "Authorization"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified.replace(tzinfo=timezone.utc))
+    return headers
@@ -0,0 +1,201 @@
+import csv
+import io
+import json
+import uuid
+from flask import current_app
+from sqlalchemy import insert, select, update
+
+from ..extensions import db
+from ..models import Listing, listing_amenity_table
+from .amenity_utils import normalize_amenities, get_or_create_amenities
+from .geo_utils import InvalidLocation, parse_coordinates, encode_geohash
+from .owner_stats_utils import apply_owner_delta
+
+
+# jsonl is accepted as another name for ndjson
+IMPORT_FORMATS = {'ndjson', 'jsonl', 'csv'}
+
+# same rules as POST /listings/create, images are given as already hosted URLs
+LISTING_REQUIRED_FIELDS = [
+    'title', 'street_address', 'city', 'state', 'pincode', 'propertyType', 'monthlyRent', 'securityDeposit',
+    'bedrooms', 'bathrooms', 'seating', 'area', 'furnishing', 'amenities'
+]
+LISTING_IMPORT_FIELDS = LISTING_REQUIRED_FIELDS + [
+    'description', 'pid', 'ownerName', 'is_verified', 'latitude', 'longitude', 'image_urls'
+]
+# maintained by the server, dropped so files from /listings/export can be imported as they are
+IGNORED_IMPORT_FIELDS = {
+    'id', 'owner_id', 'created_at', 'updated_at', 'rating_sum', 'review_count', 'average_rating', 'geo_cell'
+}
+INTEGER_FIELDS = {'bedrooms', 'bathrooms', 'seating'}
+FLOAT_FIELDS = {'monthlyRent', 'securityDeposit'}
+LIST_FIELDS = {'amenities', 'image_urls'}
+STRING_FIELDS = set(LISTING_IMPORT_FIELDS) - INTEGER_FIELDS - FLOAT_FIELDS - LIST_FIELDS - {'is_verified', 'latitude', 'longitude'}
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def read_import_rows(text, import_format):
+    """Parses a CSV or NDJSON document into (row number, dict or error message) pairs."""
+    if import_format == 'csv':
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames:
+            raise InvalidImport("CSV header row is missing")
+        # empty cells count as missing, like absent JSON keys
+        return [
+            (number, {key: value for key, value in row.items() if key is not None and value not in (None, '')})
+            for number, row in enumerate(reader, start=1)
+        ]
+
+    rows = []
+    for number, line in enumerate((line for line in text.splitlines() if line.strip()), start=1):
+        try:
+            data = json.loads(line)
+        except ValueError:
+            rows.append((number, "Invalid JSON"))
+            continue
+        rows.append((number, data if isinstance(data, dict) else "Each line must be a JSON object"))
+    return rows
+
+
+def _list_value(value):
+    # CSV cells hold JSON arrays (as written by the export) or comma separated values
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = [part.strip() for part in value.split(',') if part.strip()]
+    if not isinstance(value, list):
+        raise ValueError
+    return value
+
+
+def _bool_value(value):
+    if isinstance(value, bool): return value
+    if str(value).strip().lower() in ('1', 'true', 'yes'): return True
+    if str(value).strip().lower() in ('0', 'false', 'no'): return False
+    raise ValueError
+
+
+def _convert(field, value):
+    if field in INTEGER_FIELDS:
+        if isinstance(value, bool) or float(value) != int(float(value)):
+            raise ValueError
+        return int(float(value))
+    if field in FLOAT_FIELDS:
+        if isinstance(value, bool): raise ValueError
+        return float(value)
+    if field in LIST_FIELDS:
+        return _list_value(value)
+    if field == 'is_verified':
+        return _bool_value(value)
+    if field in STRING_FIELDS:
+        if isinstance(value, (dict, list)): raise ValueError
+        return str(value)
+    return value
+
+
+def validate_listing_row(data):
+    """Returns (listing values, None) for a valid row or (None, error message)."""
+    unknown = [key for key in data if key not in LISTING_IMPORT_FIELDS and key not in IGNORED_IMPORT_FIELDS]
+    if unknown:
+        return None, f"Unknown field(s): {', '.join(unknown)}"
+    if not all(field in data for field in LISTING_REQUIRED_FIELDS):
+        return None, "Missing required fields"
+
+    # every row carries every column, so a chunk goes out as one executemany
+    values = dict.fromkeys(LISTING_IMPORT_FIELDS, None)
+    values['is_verified'] = False
+    for field in LISTING_IMPORT_FIELDS:
+        if data.get(field) is None: continue
+        try:
+            values[field] = _convert(field, data[field])
+        except (TypeError, ValueError):
+            return None, f"Invalid value for {field}"
+
+    try:
+        values['latitude'], values['longitude'] = parse_coordinates(values.get('latitude'), values.get('longitude'))
+    except InvalidLocation as e:
+        return None, str(e)
+
+    image_urls = values.get('image_urls') or []
+    if not image_urls:
+        return None, "At least one image is required."
+    if not all(isinstance(url, str) and url.startswith(('http://', 'https://')) for url in image_urls):
+        return None, "image_urls must be http(s) URLs"
+
+    values['pid'] = values['pid'] or None
+    values['geo_cell'] = None if values['latitude'] is None else encode_geohash(values['latitude'], values['longitude'])
+    return values, None
+
+
+def _insert_chunk(owner_id, chunk):
+    """
+    Inserts a chunk of validated rows in one executemany and links their amenities in another.
+    Returns the new ids in chunk order.
+    """
+    # no RETURNING on MySQL, so the ids are read back by pid. Rows without one get a unique placeholder
+    # pid for the lookup, which is cleared again right after.
+    marker = f"import:{uuid.uuid4().hex}:"
+    keys = [values['pid'] or f"{marker}{n}" for n, values in enumerate(chunk)]
+    db.session.execute(insert(Listing), [
+        dict(values, pid=key, owner_id=owner_id) for values, key in zip(chunk, keys)
+    ])
+    ids_by_key = dict(db.session.execute(select(Listing.pid, Listing.id).where(Listing.pid.in_(keys))).all())
+    if any(key.startswith(marker) for key in keys):
+        db.session.execute(
+            update(Listing).where(Listing.pid.startswith(marker, autoescape=True)).values(pid=None)
+            .execution_options(synchronize_session=False)
+        )
+    ids = [ids_by_key[key] for key in keys]
+
+    # amenity rows are looked up (or created) once for the whole chunk
+    keys_by_listing = [(listing_id, normalize_amenities(values['amenities'])) for listing_id, values in zip(ids, chunk)]
+    all_keys = list(dict.fromkeys(key for _, amenity_keys in keys_by_listing for key in amenity_keys))
+    amenity_ids = {amenity.name: amenity.id for amenity in get_or_create_amenities(all_keys)}
+    links = [
+        {"listing_id": listing_id, "amenity_id": amenity_ids[key]}
+        for listing_id, amenity_keys in keys_by_listing for key in amenity_keys
+    ]
+    if links:
+        db.session.execute(insert(listing_amenity_table), links)
+    return ids
+
+
+def import_listings(owner_id, rows):
+    """
+    Validates parsed rows with the create rules and inserts the valid ones for owner_id, IMPORT_CHUNK_SIZE
+    rows per INSERT executemany. pids are checked against the table in one query and against each other.
+    Returns (created, errors): created holds {"row", "id"} and errors {"row", "message"} entries.
+    Nothing is committed here.
+    """
+    chunk_size = max(1, current_app.config.get('IMPORT_CHUNK_SIZE', 500))
+    valid, errors = [], []
+    for number, data in rows:
+        values, error = (None, data) if isinstance(data, str) else validate_listing_row(data)
+        if error:
+            errors.append({"row": number, "message": error})
+        else:
+            valid.append((number, values))
+
+    pids = [values['pid'] for _, values in valid if values['pid']]
+    taken = set(db.session.scalars(select(Listing.pid).where(Listing.pid.in_(pids)))) if pids else set()
+    accepted = []
+    for number, values in valid:
+        if values['pid'] and values['pid'] in taken:
+            errors.append({"row": number, "message": "Property ID is already in use."})
+            continue
+        if values['pid']: taken.add(values['pid'])
+        accepted.append((number, values))
+
+    created = []
+    for start in range(0, len(accepted), chunk_size):
+        chunk = accepted[start:start + chunk_size]
+        ids = _insert_chunk(owner_id, [values for _, values in chunk])
+        created.extend({"row": number, "id": listing_id} for (number, _), listing_id in zip(chunk, ids))
+
+    apply_owner_delta(owner_id, listings=len(created))
+    errors.sort(key=lambda error: error["row"])
+    return created, errors
@@ -0,0 +1,87 @@
+import json
+import time
+import logging
+from collections import Counter
+from flask import g, request, current_app, has_request_context
+from sqlalchemy import event
+
+from ..extensions import db
+
+
+logger = logging.getLogger(__name__)
+
+# statements shown per request in the log line when they repeat
+MAX_REPEATED_STATEMENTS = 5
+
+
+def resource_name():
+    """The flask-restful Resource class serving the current request (ListingList, ...), else the endpoint."""
+    view = current_app.view_functions.get(request.endpoint)
+    view_class = getattr(view, 'view_class', None)
+    return view_class.__name__ if view_class else (request.endpoint or 'unmatched')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    if not has_request_context(): return
+    stats = g.get('query_stats')
+    if stats is None: return
+    stats['count'] += 1
+    stats['seconds'] += elapsed
+    # the same SQL text over and over with different parameters is the N+1 signature
+    stats['statements'][statement] += 1
+
+
+def _start_request():
+    g.query_stats = {"count": 0, "seconds": 0.0, "statements": Counter(), "started": time.perf_counter()}
+
+
+def _finish_request(response):
+    stats = g.pop('query_stats', None)
+    if stats is None: return response
+    config = current_app.config
+    resource = resource_name()
+    total_ms = (time.perf_counter() - stats['started']) * 1000
+    db_ms = stats['seconds'] * 1000
+
+    budget = config['QUERY_BUDGETS'].get(resource, config['QUERY_BUDGET'])
+    repeated = [
+        {"statement": " ".join(statement.split())[:200], "count": count}
+        for statement, count in stats['statements'].most_common(MAX_REPEATED_STATEMENTS)
+        if count >= config['QUERY_REPEAT_THRESHOLD']
+    ]
+    over_budget = stats['count'] > budget
+
+    response.headers.add('Server-Timing', f'db;dur={db_ms:.2f};desc="{stats["count"]} queries"')
+    response.headers.add('Server-Timing', f'app;dur={total_ms:.2f}')
+    logger.log(logging.WARNING if over_budget or repeated else logging.INFO, json.dumps({
+        "resource": resource,
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "queries": stats['count'],
+        "db_ms": round(db_ms, 2),
+        "total_ms": round(total_ms, 2),
+        "query_budget": budget,
+        "over_budget": over_budget,
+        "repeated": repeated,
+    }))
+    return response
+
+
+def init_query_stats(app):
+    """
+    Opt-in (QUERY_STATS_ENABLED) per-request SQL accounting: query count and DB time from cursor events,
+    reported in a Server-Timing header and one JSON log line per request. Requests over their
+    QUERY_BUDGET, or repeating a statement QUERY_REPEAT_THRESHOLD times, are logged as warnings.
+    """
+    if not app.config.get('QUERY_STATS_ENABLED'): return
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
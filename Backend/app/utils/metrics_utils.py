@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import glob
+import hmac
+import threading
+from bisect import bisect_left
+from flask import g, request, current_app, Response
+
+from ..extensions import db, response_cache, ph
+from ..models import OutboundEmail
+from .upload_utils import get_upload_queue_depth
+from .instrumentation_utils import resource_name
+
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsRegistry:
+    """
+    Request counters and latency histograms of this process. Recording is a dict update under a lock.
+    With METRICS_DIR set, every worker process writes its totals to METRICS_DIR/metrics-<pid>.json at most
+    every METRICS_FLUSH_INTERVAL seconds and /metrics adds up the files of all workers, so whichever
+    worker answers the scrape reports the whole server.
+    """
+
+    def __init__(self):
+        self.buckets = ()
+        self.directory = None
+        self.flush_interval = 5
+        self._lock = threading.Lock()
+        self.reset()
+
+    def configure(self, buckets, directory, flush_interval):
+        self.buckets = tuple(sorted(buckets))
+        self.directory = directory
+        self.flush_interval = flush_interval
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = {}
+            self._durations = {}
+            self._last_flush = 0.0
+
+    def observe(self, resource, method, status, seconds):
+        with self._lock:
+            key = (resource, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            histogram = self._durations.get(resource)
+            if histogram is None:
+                # per bucket (not cumulative) counts, the last one is +Inf, then sum and count
+                histogram = self._durations[resource] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][bisect_left(self.buckets, seconds)] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+            flush_due = self.directory and time.monotonic() - self._last_flush >= self.flush_interval
+        if flush_due:
+            self.flush()
+
+    def snapshot(self):
+        gauges = collect_process_gauges()
+        cache = response_cache.stats()
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "requests": [[*key, count] for key, count in self._requests.items()],
+                "durations": {resource: [list(h[0]), h[1], h[2]] for resource, h in self._durations.items()},
+                # lookup counters, kept when the worker is retired
+                "cache": {"hits": cache["hits"], "misses": cache["misses"]},
+                "gauges": gauges,
+            }
+
+    def flush(self, snapshot=None):
+        """Writes this process's totals for the other workers to read, atomically."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(snapshot or self.snapshot(), f)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """Snapshots of every worker, this process's own taken live."""
+        own = self.snapshot()
+        if not self.directory:
+            return [own]
+        self.flush(own)
+        snapshots = [own]
+        paths = glob.glob(os.path.join(self.directory, "metrics-*.json"))
+        paths += glob.glob(os.path.join(self.directory, "retired-*.json"))
+        for path in paths:
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced right now
+            if snapshot.get("pid") == own["pid"] and not snapshot.get("retired"):
+                continue
+            if not snapshot.get("retired") and not _process_alive(snapshot.get("pid")):
+                snapshot = self._retire(path, snapshot)
+                if snapshot is None: continue
+            snapshots.append(snapshot)
+        return snapshots
+
+    def _retire(self, path, snapshot):
+        """
+        Replaces an exited worker's file with one that keeps its counters, so totals never go backwards,
+        but no gauges. Returns the retired snapshot, or None if another worker retired it first.
+        """
+        retired = dict(snapshot, gauges={}, retired=True)
+        target = os.path.join(self.directory, f"retired-{snapshot.get('pid')}-{time.time_ns()}.json")
+        temporary = f"{target}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(retired, f)
+        try:
+            # only the worker whose remove succeeds publishes the retired copy
+            os.remove(path)
+        except FileNotFoundError:
+            os.remove(temporary)
+            return None
+        os.replace(temporary, target)
+        return retired
+
+
+def _process_alive(pid):
+    if not isinstance(pid, int): return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+registry = MetricsRegistry()
+
+
+def collect_process_gauges():
+    """Current values that only make sense per process: pool usage, cache and queue sizes."""
+    pool = db.engine.pool
+    gauges = {
+        "response_cache_entries": response_cache.stats()["size"],
+        "upload_queue_depth": get_upload_queue_depth(),
+        "password_hash_queue_depth": ph.queue_depth(),
+    }
+    # SQLite's single connection pools have no size accounting
+    for name in ('size', 'checkedout', 'checkedin', 'overflow'):
+        if hasattr(pool, name):
+            gauges[f"db_pool_{name}"] = getattr(pool, name)()
+    return gauges
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def _format_le(bound):
+    return f"{bound:g}"
+
+
+PROCESS_GAUGES = {
+    "db_pool_size": "Configured connection pool size.",
+    "db_pool_checkedout": "Connections currently in use.",
+    "db_pool_checkedin": "Idle connections in the pool.",
+    "db_pool_overflow": "Connections opened beyond the pool size.",
+    "response_cache_entries": "Entries in the in-process response cache.",
+    "upload_queue_depth": "Image uploads waiting for an upload worker.",
+    "password_hash_queue_depth": "Password hash/verify calls waiting for a hashing worker.",
+}
+
+
+def render_metrics(snapshots, buckets, pending_emails):
+    """Adds up worker snapshots and renders them in the Prometheus text exposition format."""
+    requests, durations = {}, {}
+    cache_hits = cache_misses = 0
+    for snapshot in snapshots:
+        for resource, method, status, count in snapshot["requests"]:
+            requests[(resource, method, status)] = requests.get((resource, method, status), 0) + count
+        for resource, (counts, total, count) in snapshot["durations"].items():
+            merged = durations.setdefault(resource, [[0] * (len(buckets) + 1), 0.0, 0])
+            if len(counts) != len(merged[0]): continue  # written with other buckets before a restart
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+        cache_hits += snapshot.get("cache", {}).get("hits", 0)
+        cache_misses += snapshot.get("cache", {}).get("misses", 0)
+
+    lines = [
+        "# HELP nest_http_requests_total Requests handled, by resource, method and status code.",
+        "# TYPE nest_http_requests_total counter",
+    ]
+    for (resource, method, status), count in sorted(requests.items()):
+        lines.append(f"nest_http_requests_total{_labels(resource=resource, method=method, status=status)} {count}")
+
+    lines += [
+        "# HELP nest_http_request_duration_seconds Request latency, by resource.",
+        "# TYPE nest_http_request_duration_seconds histogram",
+    ]
+    for resource, (counts, total, count) in sorted(durations.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, counts):
+            cumulative += bucket_count
+            lines.append(f"nest_http_request_duration_seconds_bucket{_labels(resource=resource, le=_format_le(bound))} {cumulative}")
+        lines.append(f"nest_http_request_duration_seconds_bucket{_labels(resource=resource, le='+Inf')} {count}")
+        lines.append(f"nest_http_request_duration_seconds_sum{_labels(resource=resource)} {total:.6f}")
+        lines.append(f"nest_http_request_duration_seconds_count{_labels(resource=resource)} {count}")
+
+    lines += [
+        "# HELP nest_response_cache_lookups_total Response cache lookups, by result.",
+        "# TYPE nest_response_cache_lookups_total counter",
+        f"nest_response_cache_lookups_total{_labels(result='hit')} {cache_hits}",
+        f"nest_response_cache_lookups_total{_labels(result='miss')} {cache_misses}",
+        "# HELP nest_response_cache_hit_ratio Share of response cache lookups served from the cache.",
+        "# TYPE nest_response_cache_hit_ratio gauge",
+        f"nest_response_cache_hit_ratio {cache_hits / (cache_hits + cache_misses) if cache_hits + cache_misses else 0:.4f}",
+    ]
+
+    for name, description in PROCESS_GAUGES.items():
+        values = [(snapshot["pid"], snapshot["gauges"][name]) for snapshot in snapshots if name in snapshot["gauges"]]
+        if not values: continue
+        lines += [f"# HELP nest_{name} {description}", f"# TYPE nest_{name} gauge"]
+        lines += [f"nest_{name}{_labels(pid=pid)} {value}" for pid, value in sorted(values)]
+
+    lines += [
+        "# HELP nest_outbound_emails_pending Queued emails not yet sent.",
+        "# TYPE nest_outbound_emails_pending gauge",
+        f"nest_outbound_emails_pending {pending_emails}",
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+
+
+def _finish_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None and request.endpoint != 'metrics':
+        registry.observe(resource_name(), request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return {"success": False, "message": "Unauthorized"}, 401
+    pending_emails = OutboundEmail.query.filter(OutboundEmail.status == "Pending").count()
+    body = render_metrics(registry.collect(), registry.buckets, pending_emails)
+    return Response(body, content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def init_metrics(app):
+    """
+    Counts requests and their latency per Resource class and serves them, with pool, cache and queue
+    gauges, at GET /metrics in the Prometheus text format. Off unless METRICS_ENABLED is set.
+    """
+    if not app.config.get('METRICS_ENABLED'): return
+    registry.configure(
+        app.config.get('METRICS_LATENCY_BUCKETS', (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+        app.config.get('METRICS_DIR'),
+        app.config.get('METRICS_FLUSH_INTERVAL', 5),
+    )
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,87 @@
+from sqlalchemy import update, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import ListingDailyOccupancy, Booking, Listing
+
+
+# bookings in these states hold seats for their day
+ACTIVE_BOOKING_STATUSES = ('Confirmed', 'Pending')
+
+
+def _bump(listing_id, day, delta):
+    stmt = update(ListingDailyOccupancy).where(
+        ListingDailyOccupancy.listing_id == listing_id,
+        ListingDailyOccupancy.day == day
+    ).values(attendees=ListingDailyOccupancy.attendees + delta).execution_options(synchronize_session=False)
+    return db.session.execute(stmt).rowcount
+
+
+def _reserve(listing_id, day, attendees):
+    # the capacity test and the increment are one statement, so it holds under concurrency
+    # while only this listing-day row is locked
+    seating = select(Listing.seating).where(Listing.id == listing_id).scalar_subquery()
+    stmt = update(ListingDailyOccupancy).where(
+        ListingDailyOccupancy.listing_id == listing_id,
+        ListingDailyOccupancy.day == day,
+        ListingDailyOccupancy.attendees + attendees <= seating
+    ).values(attendees=ListingDailyOccupancy.attendees + attendees).execution_options(synchronize_session=False)
+    return db.session.execute(stmt).rowcount
+
+
+def reserve_seats(listing_id, day, attendees, seating):
+    """
+    Takes attendees seats on the listing's day only if they fit within its seating.
+    Returns False, without changing anything, when they do not.
+    """
+    if _reserve(listing_id, day, attendees):
+        return True
+    if attendees > seating or db.session.get(ListingDailyOccupancy, (listing_id, day)) is not None:
+        return False
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(ListingDailyOccupancy).values(listing_id=listing_id, day=day, attendees=attendees))
+    except IntegrityError:
+        # another transaction created the row first, go through the capacity check against it
+        return bool(_reserve(listing_id, day, attendees))
+    return True
+
+
+def remove_attendees(listing_id, day, attendees):
+    _bump(listing_id, day, -attendees)
+
+
+def get_attendees(listing_id, day):
+    """Attendees booked for one listing on one day, as a primary key lookup."""
+    row = db.session.get(ListingDailyOccupancy, (listing_id, day))
+    return row.attendees if row else 0
+
+
+def get_attendees_by_listing(listing_ids, day):
+    """Maps listing id -> attendees booked on that day, for many listings at once."""
+    if not listing_ids: return {}
+    rows = db.session.query(ListingDailyOccupancy.listing_id, ListingDailyOccupancy.attendees).filter(
+        ListingDailyOccupancy.listing_id.in_(listing_ids),
+        ListingDailyOccupancy.day == day
+    ).all()
+    return dict(rows)
+
+
+def reconcile_occupancy():
+    """Rebuilds the whole occupancy table from active bookings. Returns the number of rows written."""
+    totals = {}
+    rows = db.session.query(Booking.listing_id, Booking.created_at, Booking.attendees).filter(
+        Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+        Booking.created_at.isnot(None)
+    ).yield_per(1000)
+    for listing_id, created_at, attendees in rows:
+        key = (listing_id, created_at.date())
+        totals[key] = totals.get(key, 0) + (attendees or 0)
+
+    db.session.query(ListingDailyOccupancy).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(ListingDailyOccupancy, [
+        {"listing_id": listing_id, "day": day, "attendees": attendees}
+        for (listing_id, day), attendees in totals.items()
+    ])
+    db.session.commit()
+    return len(totals)
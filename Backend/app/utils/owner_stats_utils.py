@@ -0,0 +1,100 @@
+from sqlalchemy import update, insert, func
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import OwnerStats, Listing, Booking
+
+
+# only confirmed bookings count towards the owner's bookings and revenue
+COUNTED_BOOKING_STATUS = 'Confirmed'
+
+
+def _bump(owner_id, listings, bookings, revenue):
+    stmt = update(OwnerStats).where(OwnerStats.owner_id == owner_id).values(
+        total_listings=OwnerStats.total_listings + listings,
+        total_bookings=OwnerStats.total_bookings + bookings,
+        total_revenue=OwnerStats.total_revenue + revenue
+    ).execution_options(synchronize_session=False)
+    return db.session.execute(stmt).rowcount
+
+
+def apply_owner_delta(owner_id, listings=0, bookings=0, revenue=0.0):
+    """Adjusts the owner's summary row in the current transaction, creating it on first use."""
+    if not (listings or bookings or revenue) or _bump(owner_id, listings, bookings, revenue):
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(OwnerStats).values(
+                owner_id=owner_id, total_listings=listings, total_bookings=bookings, total_revenue=revenue
+            ))
+    except IntegrityError:
+        # another transaction created the row first
+        _bump(owner_id, listings, bookings, revenue)
+
+
+def record_listing_created(listing):
+    apply_owner_delta(listing.owner_id, listings=1)
+
+
+def record_listing_deleted(listing):
+    """Takes the listing and the confirmed bookings that go away with it out of the owner's summary."""
+    confirmed = _confirmed_count(listing.id)
+    apply_owner_delta(listing.owner_id, listings=-1, bookings=-confirmed, revenue=-confirmed * listing.monthlyRent)
+
+
+def record_rent_changed(listing, old_rent):
+    """Re-prices the listing's confirmed bookings after a monthlyRent change."""
+    delta = float(listing.monthlyRent) - float(old_rent)
+    if not delta: return
+    confirmed = _confirmed_count(listing.id)
+    if confirmed:
+        apply_owner_delta(listing.owner_id, revenue=confirmed * delta)
+
+
+def record_booking_status_change(listing, old_status, new_status, count=1):
+    """Applies count bookings of one listing moving from old_status to new_status."""
+    was_counted = old_status == COUNTED_BOOKING_STATUS
+    is_counted = new_status == COUNTED_BOOKING_STATUS
+    if was_counted == is_counted: return
+    sign = count if is_counted else -count
+    apply_owner_delta(listing.owner_id, bookings=sign, revenue=sign * listing.monthlyRent)
+
+
+def _confirmed_count(listing_id):
+    return db.session.query(func.count(Booking.id)).filter(
+        Booking.listing_id == listing_id, Booking.status == COUNTED_BOOKING_STATUS
+    ).scalar() or 0
+
+
+def get_owner_stats(owner_id):
+    """Summary for the dashboard as a primary key lookup."""
+    row = db.session.get(OwnerStats, owner_id)
+    if row is None:
+        return {"total_listings": 0, "total_bookings": 0, "total_revenue": 0.0}
+    return {
+        "total_listings": row.total_listings,
+        "total_bookings": row.total_bookings,
+        "total_revenue": round(row.total_revenue or 0.0, 2)
+    }
+
+
+def reconcile_owner_stats():
+    """Rebuilds owner_stats from the listing and booking tables. Returns the number of owners written."""
+    totals = {}
+    for owner_id, listings in db.session.query(Listing.owner_id, func.count(Listing.id)).group_by(Listing.owner_id):
+        totals[owner_id] = [listings, 0, 0.0]
+    booking_rows = db.session.query(
+        Listing.owner_id, func.count(Booking.id), func.sum(Listing.monthlyRent)
+    ).join(Booking, Booking.listing_id == Listing.id).filter(
+        Booking.status == COUNTED_BOOKING_STATUS
+    ).group_by(Listing.owner_id)
+    for owner_id, bookings, revenue in booking_rows:
+        totals.setdefault(owner_id, [0, 0, 0.0])[1:] = [bookings, float(revenue or 0.0)]
+
+    db.session.query(OwnerStats).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(OwnerStats, [
+        {"owner_id": owner_id, "total_listings": listings, "total_bookings": bookings, "total_revenue": revenue}
+        for owner_id, (listings, bookings, revenue) in totals.items()
+    ])
+    db.session.commit()
+    return len(totals)
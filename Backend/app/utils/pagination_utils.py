@@ -0,0 +1,97 @@
+import base64
+import json
+from flask import current_app
+from sqlalchemy import or_, and_
+
+from ..extensions import db
+from ..models import Listing
+
+
+# sort_by value -> (sort column, descending). ties are always broken on Listing.id
+# in the same direction, so (sort key, id) is unique and stable across pages.
+LISTING_SORTS = {
+    None: (Listing.id, False),
+    'rent_asc': (Listing.monthlyRent, False),
+    'rent_desc': (Listing.monthlyRent, True),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_by, sort_value, last_id):
+    payload = json.dumps({"s": sort_by, "k": sort_value, "id": last_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort_by):
+    """Returns (sort_value, last_id) for a cursor issued for the same sort order."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        sort_value, last_id = payload["k"], payload["id"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Invalid cursor")
+    if payload.get("s") != sort_by or not isinstance(last_id, int):
+        raise InvalidCursor("Cursor does not match the requested sort order")
+    return sort_value, last_id
+
+
+def get_page_size(requested):
+    """Clamps the requested page size to the configured bounds."""
+    default = current_app.config['LISTINGS_PAGE_SIZE']
+    maximum = current_app.config['LISTINGS_MAX_PAGE_SIZE']
+    if requested is None or requested <= 0:
+        return default
+    return min(requested, maximum)
+
+
+def paginate_listings(query, sort_by, cursor, limit, relevance=None, distance=None):
+    """
+    Applies keyset pagination on (sort key, id) to a Core select of listing columns (see listing_select),
+    which must include id and the sort column under their attribute names.
+    relevance (ascending = best first) is the default order when given, distance is used for
+    sort_by=distance. Returns (rows, next_cursor, has_more).
+    """
+    computed_sorts = {'relevance': relevance, 'distance': distance}
+    if sort_by not in LISTING_SORTS and computed_sorts.get(sort_by) is None:
+        sort_by = None
+    if sort_by is None and relevance is not None:
+        sort_by = 'relevance'
+
+    # computed sort keys are selected as the last column so the cursor can be built from them
+    expression = computed_sorts.get(sort_by)
+    if expression is not None:
+        sort_column, descending = expression, False
+        query = query.add_columns(expression)
+    else:
+        sort_column, descending = LISTING_SORTS[sort_by]
+
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, sort_by)
+        if sort_column is Listing.id:
+            query = query.filter(Listing.id < last_id if descending else Listing.id > last_id)
+        elif descending:
+            query = query.filter(or_(sort_column < sort_value, and_(sort_column == sort_value, Listing.id < last_id)))
+        else:
+            query = query.filter(or_(sort_column > sort_value, and_(sort_column == sort_value, Listing.id > last_id)))
+
+    if sort_column is Listing.id:
+        query = query.order_by(Listing.id.desc() if descending else Listing.id.asc())
+    elif descending:
+        query = query.order_by(sort_column.desc(), Listing.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), Listing.id.asc())
+
+    # fetch one extra row to know whether another page exists
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        sort_value = last[-1] if expression is not None else getattr(last, sort_column.key)
+        next_cursor = encode_cursor(sort_by, sort_value, last.id)
+    return rows, next_cursor, has_more
@@ -0,0 +1,103 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from statistics import median
+from argon2 import PasswordHasher
+
+
+class PasswordHashingBusy(Exception):
+    pass
+
+
+class PasswordHashing:
+    """
+    Argon2 hashing with parameters from Config, run on a small bounded pool.
+    Argon2 releases the GIL, so PASSWORD_HASH_WORKERS caps how many cores hashing can take. At most
+    PASSWORD_HASH_MAX_PENDING more calls may wait for a worker, beyond that PasswordHashingBusy is raised
+    straight away instead of queueing. hash/verify/check_needs_rehash mirror argon2.PasswordHasher.
+    """
+
+    def __init__(self, app=None):
+        self.hasher = PasswordHasher()
+        self.workers = 2
+        self.max_pending = 32
+        self.timeout = 10
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.hasher = PasswordHasher(
+            time_cost=app.config.get('ARGON2_TIME_COST', 3),
+            memory_cost=app.config.get('ARGON2_MEMORY_COST', 65536),
+            parallelism=app.config.get('ARGON2_PARALLELISM', 4),
+        )
+        self.workers = max(1, app.config.get('PASSWORD_HASH_WORKERS', 2))
+        self.max_pending = max(0, app.config.get('PASSWORD_HASH_MAX_PENDING', 32))
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+            self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='argon2')
+        return self._executor
+
+    def _run(self, fn, *args):
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise PasswordHashingBusy("Too many password operations in progress")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        # the slot is held until the work itself finishes, even if the caller stops waiting
+        future.add_done_callback(lambda f: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHashingBusy("Password operation timed out")
+
+    def queue_depth(self):
+        """Calls waiting for a hashing worker."""
+        executor = self._executor
+        return executor._work_queue.qsize() if executor is not None else 0
+
+    def hash(self, password):
+        return self._run(self.hasher.hash, password)
+
+    def verify(self, hash, password):
+        """Raises argon2's VerifyMismatchError on a wrong password, like PasswordHasher.verify."""
+        return self._run(self.hasher.verify, hash, password)
+
+    def check_needs_rehash(self, hash):
+        # only parses the encoded parameters, cheap enough for the request thread
+        return self.hasher.check_needs_rehash(hash)
+
+
+def calibrate_argon2(target_ms=250, memory_cost=65536, parallelism=4, samples=5, max_time_cost=20):
+    """
+    Raises time_cost from 1 until the median hash takes at least target_ms on this machine at the given
+    memory_cost (KiB) and parallelism. Returns the chosen parameters and the timings measured on the way.
+    """
+    timings = []
+    for time_cost in range(1, max_time_cost + 1):
+        hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+        durations = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            hasher.hash("calibration-password")
+            durations.append((time.perf_counter() - start) * 1000)
+        timings.append((time_cost, median(durations)))
+        if timings[-1][1] >= target_ms:
+            break
+    time_cost, ms = timings[-1]
+    return {"time_cost": time_cost, "memory_cost": memory_cost, "parallelism": parallelism, "ms": ms, "timings": timings}
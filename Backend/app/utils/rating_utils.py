@@ -0,0 +1,49 @@
+from sqlalchemy import update, case, func
+
+from ..extensions import db
+from ..models import Listing, Review
+
+
+def _apply_rating_delta(listing_id, rating_delta, count_delta):
+    new_sum = Listing.rating_sum + rating_delta
+    new_count = Listing.review_count + count_delta
+    # average is assigned first: MySQL evaluates SET clauses left to right,
+    # so later assignments would otherwise see the already updated columns.
+    stmt = update(Listing).where(Listing.id == listing_id).ordered_values(
+        (Listing.average_rating, case((new_count > 0, new_sum * 1.0 / new_count), else_=None)),
+        (Listing.rating_sum, new_sum),
+        (Listing.review_count, new_count),
+    ).execution_options(synchronize_session=False)
+    db.session.execute(stmt)
+
+
+def record_review(listing_id, rating):
+    """Adds a review's rating to the listing's aggregates in the current transaction."""
+    _apply_rating_delta(listing_id, rating, 1)
+
+
+def discard_review(listing_id, rating):
+    """Removes a review's rating from the listing's aggregates in the current transaction."""
+    _apply_rating_delta(listing_id, -rating, -1)
+
+
+def reconcile_listing_ratings():
+    """Recomputes every listing's aggregates from the review table. Returns the number of listings fixed."""
+    stats = {
+        listing_id: (int(rating_sum or 0), review_count)
+        for listing_id, rating_sum, review_count in db.session.query(
+            Review.listing_id, func.sum(Review.rating), func.count(Review.id)
+        ).group_by(Review.listing_id)
+    }
+
+    fixed = 0
+    for listing in Listing.query.all():
+        rating_sum, review_count = stats.get(listing.id, (0, 0))
+        average_rating = rating_sum / review_count if review_count else None
+        if (listing.rating_sum, listing.review_count, listing.average_rating) != (rating_sum, review_count, average_rating):
+            listing.rating_sum = rating_sum
+            listing.review_count = review_count
+            listing.average_rating = average_rating
+            fixed += 1
+    db.session.commit()
+    return fixed
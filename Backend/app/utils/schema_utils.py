@@ -0,0 +1,55 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from ..extensions import db
+from ..models import User, Listing, Booking, TokenBlocklist
+
+
+# (model, column names) added to tables that already existed. db.create_all() creates missing tables
+# but never alters existing ones, so `flask upgrade-schema` adds these columns and their indexes.
+SCHEMA_UPGRADES = [
+    # review aggregates, backfilled by `flask reconcile-ratings`
+    (Listing, ['rating_sum', 'review_count', 'average_rating']),
+    # ETag version signals
+    (User, ['updated_at']),
+    (Listing, ['updated_at']),
+    (Booking, ['updated_at']),
+    # geo search, geo_cell is backfilled by `flask reindex-geo-cells` once coordinates are set
+    (Listing, ['latitude', 'longitude', 'geo_cell']),
+    # blocklist pruning by expiry or deleted user, created_at only gains an index
+    (TokenBlocklist, ['created_at', 'expires_at', 'user_id']),
+]
+
+
+def add_missing_columns(model, names):
+    """
+    ALTERs the model's table to add those of the named columns it lacks, then creates the model's indexes
+    on the named columns that do not exist yet. Returns the column and index names added.
+    """
+    table = model.__table__
+    inspector = inspect(db.engine)
+    columns = {column['name'] for column in inspector.get_columns(table.name)}
+    indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+    preparer = db.engine.dialect.identifier_preparer
+    added = []
+    with db.engine.begin() as conn:
+        for name in names:
+            if name in columns: continue
+            column_ddl = CreateColumn(table.c[name]).compile(dialect=db.engine.dialect)
+            conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_ddl}"))
+            added.append(name)
+        for index in table.indexes:
+            if index.name in indexes or not any(column.name in names for column in index.columns): continue
+            index.create(conn)
+            added.append(index.name)
+    return added
+
+
+def upgrade_schema():
+    """Applies SCHEMA_UPGRADES to an existing database. Returns {table name: names added}."""
+    changes = {}
+    for model, names in SCHEMA_UPGRADES:
+        added = add_missing_columns(model, names)
+        if added:
+            changes.setdefault(model.__tablename__, []).extend(added)
+    return changes
@@ -0,0 +1,98 @@
+import re
+from sqlalchemy import text, table, column, select, literal_column, inspect, or_
+from sqlalchemy.dialects.mysql import match as mysql_match
+
+from ..extensions import db
+from ..models import Listing
+
+
+# columns covered by the keyword index
+SEARCH_COLUMNS = ['title', 'description', 'street_address', 'city', 'state', 'pincode', 'pid', 'ownerName']
+
+FTS_TABLE = 'listing_fts'
+MYSQL_FULLTEXT_INDEX = 'ft_listing_search'
+
+_cols = ', '.join(SEARCH_COLUMNS)
+_new_cols = ', '.join(f'new.{c}' for c in SEARCH_COLUMNS)
+_old_cols = ', '.join(f'old.{c}' for c in SEARCH_COLUMNS)
+
+# external content FTS5 table over listing, kept in sync by triggers so every
+# write path (routes, cascades, bulk loads) updates the index in the same transaction.
+SQLITE_FTS_DDL = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({_cols}, content='listing', content_rowid='id', prefix='2 3')",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON listing BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_cols}) VALUES (new.id, {_new_cols});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON listing BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_cols}) VALUES ('delete', old.id, {_old_cols});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_cols} ON listing BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_cols}) VALUES ('delete', old.id, {_old_cols});
+        INSERT INTO {FTS_TABLE}(rowid, {_cols}) VALUES (new.id, {_new_cols});
+    END""",
+]
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def ensure_search_index():
+    """Creates the full-text index for the configured database if it is missing."""
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        with db.engine.begin() as conn:
+            exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}).first()
+            if exists:
+                return
+            for ddl in SQLITE_FTS_DDL:
+                conn.execute(text(ddl))
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    elif dialect == 'mysql':
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('listing')}
+        if MYSQL_FULLTEXT_INDEX not in indexes:
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE listing ADD FULLTEXT INDEX {MYSQL_FULLTEXT_INDEX} ({_cols})"))
+
+
+def rebuild_search_index():
+    """Repopulates the index from the listing table. MySQL maintains FULLTEXT itself."""
+    ensure_search_index()
+    if _dialect() == 'sqlite':
+        with db.engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def _terms(keyword):
+    return re.findall(r'\w+', keyword, re.UNICODE)
+
+
+def apply_keyword_search(query, keyword):
+    """
+    Restricts a Listing query to keyword matches. Every word must match, as a prefix.
+    Returns (query, relevance) where relevance sorts best matches first in ascending order,
+    or None when the database has no full-text support and a plain substring filter is used.
+    """
+    dialect = _dialect()
+    terms = _terms(keyword)
+
+    if dialect == 'sqlite' and terms:
+        fts = table(FTS_TABLE, column('rowid'), column('rank'))
+        match_expr = ' '.join(f'"{term}"*' for term in terms)
+        matches = select(fts.c.rowid.label('listing_id'), fts.c.rank.label('score')).where(
+            literal_column(FTS_TABLE).op('MATCH')(match_expr)
+        ).subquery()
+        # bm25 rank: lower is more relevant
+        return query.join(matches, matches.c.listing_id == Listing.id), matches.c.score
+
+    if dialect == 'mysql' and terms:
+        against = ' '.join(f'+{term}*' for term in terms)
+        score = mysql_match(*[getattr(Listing, c) for c in SEARCH_COLUMNS], against=against).in_boolean_mode()
+        return query.filter(score > 0), -score
+
+    return query.filter(or_(
+        Listing.title.ilike(f'%{keyword}%'),
+        Listing.description.ilike(f'%{keyword}%'),
+        Listing.pid.ilike(f'%{keyword}%'),
+        Listing.ownerName.ilike(f'%{keyword}%')
+    )), None
@@ -0,0 +1,107 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from flask import current_app
+import cloudinary.uploader
+
+
+class UploadError(Exception):
+    pass
+
+
+class CloudinaryUploader:
+    """Default uploader. Any object with the same upload/destroy methods can be set as IMAGE_UPLOADER."""
+
+    def upload(self, file):
+        result = cloudinary.uploader.upload(file)
+        return {"url": result['secure_url'], "public_id": result.get('public_id')}
+
+    def destroy(self, public_id):
+        cloudinary.uploader.destroy(public_id)
+
+
+_default_uploader = CloudinaryUploader()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process wide pool shared by every request, sized by UPLOAD_POOL_SIZE on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('UPLOAD_POOL_SIZE', 8), thread_name_prefix='upload'
+                )
+    return _executor
+
+
+def get_upload_queue_depth():
+    """Uploads submitted to the shared pool that no worker has picked up yet."""
+    return _executor._work_queue.qsize() if _executor is not None else 0
+
+
+def get_uploader():
+    return current_app.config.get('IMAGE_UPLOADER') or _default_uploader
+
+
+def _destroy_quietly(uploader, result):
+    try:
+        if result.get("public_id"): uploader.destroy(result["public_id"])
+    except Exception:
+        pass
+
+
+def _discard_when_done(executor, uploader, future):
+    # an upload that was already running when the batch failed is removed once it lands
+    def callback(f):
+        if not f.cancelled() and f.exception() is None:
+            executor.submit(_destroy_quietly, uploader, f.result())
+    future.add_done_callback(callback)
+
+
+def upload_images(files):
+    """
+    Uploads files concurrently on the shared pool, at most UPLOAD_MAX_CONCURRENCY at a time for this
+    request and within UPLOAD_TIMEOUT seconds overall. Returns the URLs in the order of files.
+    On any failure the remaining uploads are cancelled, finished ones are deleted and UploadError is raised.
+    """
+    if not files: return []
+    uploader = get_uploader()
+    executor = get_executor()
+    limit = max(1, current_app.config.get('UPLOAD_MAX_CONCURRENCY', 4))
+    deadline = time.monotonic() + current_app.config.get('UPLOAD_TIMEOUT', 30)
+
+    pending = list(enumerate(files))
+    running = {}
+    results = [None] * len(files)
+    error = None
+
+    while (pending or running) and error is None:
+        while pending and len(running) < limit:
+            index, file = pending.pop(0)
+            running[executor.submit(uploader.upload, file)] = index
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            error = UploadError("Image upload timed out")
+            break
+        done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = running.pop(future)
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                error = UploadError(f"Image upload failed: {str(e)}")
+
+    if error is not None:
+        for future in running:
+            if not future.cancel():
+                _discard_when_done(executor, uploader, future)
+        for result in results:
+            if result is not None:
+                executor.submit(_destroy_quietly, uploader, result)
+        raise error
+
+    return [result["url"] for result in results]
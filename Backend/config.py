@@ -18,16 +18,88 @@ class Config:
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     JWT_BLOCKLIST_ENABLED = True
     JWT_BLOCKLIST_TOKEN_CHECKS = ['access', 'refresh']
+    JWT_BLOCKLIST_REFRESH_SECONDS = int(os.getenv("JWT_BLOCKLIST_REFRESH_SECONDS", 5))
+    JWT_BLOCKLIST_RELOAD_SECONDS = int(os.getenv("JWT_BLOCKLIST_RELOAD_SECONDS", 3600))
     
 
     # mail configuration
-    MAIL_SERVER = 'smtp.gmail.com'
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
+    MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com")
+    MAIL_PORT = int(os.getenv("MAIL_PORT", 587))
+    MAIL_USE_TLS = os.getenv("MAIL_USE_TLS", "true").lower() == "true"
     MAIL_USE_SSL = False
     MAIL_USERNAME = os.getenv("MAIL_USERNAME")
     MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
     MAIL_DEFAULT_SENDER = os.getenv("MAIL_USERNAME")
+
+    # outbound mail queue, drained by `flask send-queued-emails`
+    EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 50))
+    EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 5))
+    EMAIL_RETRY_BASE_SECONDS = int(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30))
+    
+
+    # pagination for listing endpoints
+    LISTINGS_PAGE_SIZE = int(os.getenv("LISTINGS_PAGE_SIZE", 20))
+    LISTINGS_MAX_PAGE_SIZE = int(os.getenv("LISTINGS_MAX_PAGE_SIZE", 100))
+
+    # geo search
+    GEO_DEFAULT_RADIUS_KM = float(os.getenv("GEO_DEFAULT_RADIUS_KM", 5))
+    GEO_MAX_RADIUS_KM = float(os.getenv("GEO_MAX_RADIUS_KM", 100))
+    GEO_MAX_CELLS = int(os.getenv("GEO_MAX_CELLS", 16))  # geohash prefixes scanned per query
+
+    # search facets (?facets=1)
+    FACET_MAX_VALUES = int(os.getenv("FACET_MAX_VALUES", 20))  # most frequent values returned per facet
+    FACET_RENT_BUCKETS = [int(b) for b in os.getenv("FACET_RENT_BUCKETS", "5000,10000,15000,20000,30000").split(",")]
+    
+
+    # in-process cache of serialized listing reads
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 512))
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 30))  # seconds
+    
+
+    # image uploads, fanned out over a shared thread pool
+    UPLOAD_POOL_SIZE = int(os.getenv("UPLOAD_POOL_SIZE", 8))
+    UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", 4))  # per request
+    UPLOAD_TIMEOUT = int(os.getenv("UPLOAD_TIMEOUT", 30))  # seconds, whole batch
+    IMAGE_UPLOADER = None  # object with upload(file) / destroy(public_id), defaults to Cloudinary
+
+    # streaming exports, rows fetched per server side cursor batch
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+    # password hashing, run `flask calibrate-password-hashing` to pick ARGON2_TIME_COST for the host.
+    # stored hashes made with other parameters are upgraded on the next login
+    ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", 3))
+    ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", 65536))  # KiB
+    ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", 4))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))  # per process
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))  # waiting beyond the workers, then 503
+    PASSWORD_HASH_TIMEOUT = int(os.getenv("PASSWORD_HASH_TIMEOUT", 10))  # seconds
+
+    # opt-in per-request SQL accounting: Server-Timing header and one log line per request
+    QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "false").lower() == "true"
+    QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", 20))  # queries per request before it is flagged
+    QUERY_BUDGETS = {  # per resource overrides, e.g. "ListingList=6,OwnerDashboard=8"
+        name.strip(): int(limit) for name, limit in
+        (item.split("=") for item in os.getenv("QUERY_BUDGETS", "").split(",") if item.strip())
+    }
+    QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", 5))  # same statement this often = N+1
+
+    # GET /metrics in the Prometheus text format
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # when set, scrapes must send "Authorization: Bearer <token>"
+    METRICS_DIR = os.getenv("METRICS_DIR")  # shared by the worker processes of one server, empty it on start
+    METRICS_FLUSH_INTERVAL = int(os.getenv("METRICS_FLUSH_INTERVAL", 5))  # seconds between a worker's writes
+    METRICS_LATENCY_BUCKETS = [float(b) for b in os.getenv("METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10").split(",")]
+
+    # bulk booking status updates
+    BOOKING_BULK_MAX_IDS = int(os.getenv("BOOKING_BULK_MAX_IDS", 500))  # per request
+
+    # `flask stress-test-bookings` commits synthetic rows, it never runs on SQLALCHEMY_DATABASE_URI
+    STRESS_TEST_DATABASE_URI = os.getenv("STRESS_TEST_DATABASE_URI")  # an empty database, defaults to a temporary SQLite file
+
+    # bulk listing imports
+    IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", 5000))  # per request
+    IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 500))  # rows per INSERT
     
 
     # frontend URL for CORS